@@ -0,0 +1,61 @@
+# benchmarks/codec_bench.py
+
+# Microbenchmark de los codecs JSON de native_messaging sobre cargas similares a las
+# respuestas de requestExtra/requestBinary (fragmentos binarios como lista de bytes o
+# base64, y fragmentos de texto).
+#
+# Uso: python benchmarks/codec_bench.py [--iterations N] [--chunk BYTES]
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vdhcoapp_py import native_messaging
+from vdhcoapp_py import request_ops
+
+def build_payloads(chunk_size):
+    """Mensajes de respuesta RPC típicos de una descarga en curso."""
+    data = os.urandom(chunk_size)
+    text = (b"<p>Lorem ipsum dolor sit amet, \xc3\xb1and\xc3\xba \xe2\x82\xac</p>\n" * (chunk_size // 48)).decode('utf-8')
+    reply = lambda result: {"type": "weh#rpc", "_reply": 42, "_result": result}
+    return {
+        "binary-array": reply({"id": 1, "data": list(data[:request_ops.MAX_CHUNK_SIZE["array"]]), "more": True}),
+        "binary-base64": reply({"id": 1, "data": base64.b64encode(data).decode('ascii'), "encoding": "base64", "more": True}),
+        "text": reply({"id": 2, "data": text, "more": True}),
+        "small": reply({"id": 3, "data": [], "more": True})
+    }
+
+def measure(func, arg, iterations):
+    """Tiempo medio por llamada en microsegundos."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los codecs JSON de Native Messaging.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--chunk", type=int, default=192 * 1024, help="Bytes por fragmento")
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.chunk)
+    print(f"{'codec':<8} {'carga':<14} {'bytes':>9} {'encode µs':>11} {'decode µs':>11}")
+    for name in native_messaging.CODECS:
+        try:
+            native_messaging.set_codec(name)
+        except Exception:
+            print(f"{name:<8} (no instalado)")
+            continue
+        for label, message in payloads.items():
+            iterations = args.iterations * (100 if label == "small" else 1)
+            encoded = native_messaging.encode_message(message)
+            enc = measure(native_messaging.encode_message, message, iterations)
+            dec = measure(native_messaging.decode, encoded, iterations)
+            print(f"{name:<8} {label:<14} {len(encoded):>9} {enc:>11.1f} {dec:>11.1f}")
+
+if __name__ == "__main__":
+    main()
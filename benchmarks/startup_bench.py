@@ -0,0 +1,77 @@
+# benchmarks/startup_bench.py
+
+# Mide el arranque en frío de la CoApp:
+#  - importtime: tiempo acumulado de importación por módulo (python -X importtime)
+#    al importar vdhcoapp_py.main, con los módulos más costosos.
+#  - primer mensaje: tiempo desde el lanzamiento del proceso en modo Native Messaging
+#    hasta recibir la respuesta a un 'ping' (lo que espera el navegador en cada conexión).
+#
+# Uso: python benchmarks/startup_bench.py [--runs N] [--top N]
+
+import argparse
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(top):
+    """Módulos con mayor tiempo acumulado de importación (µs)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import vdhcoapp_py.main"],
+                          cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # Formato: "import time: <propio µs> | <acumulado µs> | <módulo>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    total = next((c for c, _, n in rows if n.strip() == "vdhcoapp_py.main"), 0)
+    return total, sorted(rows, reverse=True)[:top]
+
+def frame(message):
+    body = json.dumps(message).encode('utf-8')
+    return struct.pack('<I', len(body)) + body
+
+def first_message():
+    """Segundos desde el lanzamiento hasta la respuesta al primer 'ping'."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "vdhcoapp_py.main"], cwd=ROOT,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    proc.stdin.write(frame({"type": "weh#rpc", "_request": 1, "_method": "ping", "_args": ["x"]}))
+    proc.stdin.flush()
+    header = proc.stdout.read(4)
+    elapsed = time.perf_counter() - start
+    if header:
+        proc.stdout.read(struct.unpack('<I', header)[0])
+    proc.stdin.close()
+    proc.wait(10)
+    return elapsed if header else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío de la CoApp.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total, rows = import_times(args.top)
+    print(f"Importación de vdhcoapp_py.main: {total / 1000:.1f} ms")
+    print(f"{'acumulado ms':>13} {'propio ms':>10}  módulo")
+    for cumulative, own, name in rows:
+        print(f"{cumulative / 1000:>13.1f} {own / 1000:>10.1f}  {name}")
+
+    samples = [first_message() for _ in range(args.runs)]
+    valid = [s for s in samples if s is not None]
+    if not valid:
+        print("\nPrimer mensaje: sin respuesta (¿falta config.toml o una dependencia?)")
+        return
+    print(f"\nPrimer mensaje ({len(valid)}/{args.runs} ejecuciones): "
+          f"mediana {statistics.median(valid) * 1000:.1f} ms, "
+          f"mín {min(valid) * 1000:.1f} ms, máx {max(valid) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
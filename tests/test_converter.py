@@ -0,0 +1,134 @@
+# tests/test_converter.py
+
+import os
+import sys
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from vdhcoapp_py import converter
+from vdhcoapp_py import hwaccel
+
+# ffmpeg de prueba: anota sus argumentos (una línea por ejecución) y escribe tres
+# bloques de '-progress'. Con un codificador NVENC falla al arrancar, como un
+# equipo sin GPU compatible.
+STUB_FFMPEG = """#!{python}
+import os, sys
+args = sys.argv[1:]
+with open(os.environ["STUB_FFMPEG_LOG"], "a") as f:
+    f.write(" ".join(args) + "\\n")
+if any(arg.endswith("_nvenc") for arg in args):
+    sys.stderr.write("Cannot load libcuda.so.1\\n")
+    sys.exit(1)
+for i in range(1, 4):
+    sys.stderr.write("ruido de ffmpeg\\n")
+    sys.stdout.write(
+        f"frame={{i * 25}}\\nfps=25.00\\nbitrate=1234.5kbits/s\\ntotal_size={{i * 1000}}\\n"
+        f"out_time_us={{i * 1000000}}\\nspeed=1.5x\\nprogress={{'end' if i == 3 else 'continue'}}\\n")
+    sys.stdout.flush()
+"""
+
+CAPABILITIES = {
+    "encoders": {"libx264": {}, "h264_nvenc": {}},
+    "hwaccels": ["cuda"]
+}
+
+class ProgressParsingTest(unittest.TestCase):
+    """Los bloques de '-progress' se normalizan a números."""
+
+    def test_parse_progress(self):
+        progress = converter.parse_progress({
+            "frame": "75", "fps": "25.00", "out_time_us": "3000000", "speed": "1.5x",
+            "bitrate": "1234.5kbits/s", "total_size": "3000", "progress": "end"
+        })
+        self.assertEqual(progress, {
+            "frame": 75, "fps": 25.0, "outTimeMs": 3000, "speed": 1.5,
+            "bitrate": 1234.5, "totalSize": 3000.0, "progress": "end"
+        })
+
+    def test_parse_progress_not_available(self):
+        progress = converter.parse_progress({"frame": "0", "speed": "N/A", "bitrate": "N/A", "progress": "continue"})
+        self.assertIsNone(progress['speed'])
+        self.assertIsNone(progress['bitrate'])
+        self.assertIsNone(progress['outTimeMs'])
+
+    def test_with_threads(self):
+        self.assertEqual(converter.with_threads(["-i", "in.mp4", "out.mp4"], 4),
+                         ["-i", "in.mp4", "-threads", "4", "out.mp4"])
+        args = ["-i", "in.mp4", "-threads", "2", "out.mp4"]
+        self.assertEqual(converter.with_threads(args, 4), args)
+
+@unittest.skipUnless(os.name == 'posix', "el ffmpeg de prueba es un script con shebang")
+class StubFfmpegTest(unittest.TestCase):
+    """Conversiones completas contra un ffmpeg de prueba en PATH."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log = os.path.join(self.directory, "calls.log")
+        ffmpeg = os.path.join(self.directory, "ffmpeg")
+        with open(ffmpeg, "w") as f:
+            f.write(STUB_FFMPEG.format(python=sys.executable))
+        os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IXUSR)
+
+        env = mock.patch.dict(os.environ, {
+            "PATH": self.directory + os.pathsep + os.environ.get("PATH", ""),
+            "STUB_FFMPEG_LOG": self.log
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        # find_binary memoriza la ruta y exec_dir va antes que PATH
+        exec_dir = mock.patch.object(converter, "exec_dir", self.directory)
+        exec_dir.start()
+        self.addCleanup(exec_dir.stop)
+        converter.binaries.clear()
+        self.addCleanup(converter.binaries.clear)
+        self.addCleanup(hwaccel.failed_encoders.clear)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def calls(self):
+        with open(self.log) as f:
+            return [line.split() for line in f.read().splitlines()]
+
+    def test_progress_and_threads(self):
+        output = os.path.join(self.directory, "out.mp4")
+        job = converter.enqueue_job(["-i", "in.mp4", "-c:v", "libx264", output], {"threads": 3})
+        result = job['future'].result(timeout=30)
+
+        self.assertEqual(result['exitCode'], 0)
+        self.assertIn("ruido de ffmpeg", result['stderr'])
+        self.assertEqual(job['progress']['frame'], 75)
+        self.assertEqual(job['progress']['outTimeMs'], 3000)
+        self.assertEqual(job['progress']['speed'], 1.5)
+        self.assertEqual(job['progress']['progress'], "end")
+
+        [args] = self.calls()
+        self.assertEqual(args[:5], ["-progress", "pipe:1", "-hide_banner", "-loglevel", "error"])
+        self.assertEqual(args[-3:], ["-threads", "3", output])
+
+    def test_software_fallback(self):
+        output = os.path.join(self.directory, "out.mp4")
+        args = ["-i", "in.mp4", "-c:v", "libx264", "-crf", "20", output]
+        with mock.patch.object(converter.capabilities, "get", return_value=CAPABILITIES):
+            accel = converter.select_acceleration(args)
+        self.assertEqual(accel['encoders'], ["h264_nvenc"])
+
+        job = converter.enqueue_job(args, {}, accel)
+        result = job['future'].result(timeout=30)
+
+        self.assertEqual(result['exitCode'], 0)
+        self.assertEqual(job['fallback']['encoders'], ["h264_nvenc"])
+        self.assertEqual(job['fallback']['exitCode'], 1)
+        self.assertTrue(hwaccel.has_failed(["h264_nvenc"]))
+
+        hardware, software = self.calls()
+        self.assertIn("h264_nvenc", hardware)
+        self.assertIn("-hwaccel", hardware)
+        self.assertIn("libx264", software)
+        self.assertNotIn("h264_nvenc", software)
+        # El intento fallido pudo crear la salida: la repetición la sobrescribe
+        self.assertIn("-y", software)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+# tests/test_downloads.py
+
+import unittest
+
+from vdhcoapp_py import downloads
+
+class ClampSegmentsTest(unittest.TestCase):
+    """El número de conexiones 'Range' que pide la extensión queda acotado."""
+
+    def test_default_when_missing(self):
+        self.assertEqual(downloads.clamp_segments(None), downloads.DEFAULT_SEGMENTS)
+        self.assertEqual(downloads.clamp_segments(0), downloads.DEFAULT_SEGMENTS)
+
+    def test_upper_bound(self):
+        self.assertEqual(downloads.clamp_segments(10000), downloads.MAX_SEGMENTS)
+        self.assertEqual(downloads.clamp_segments("64"), downloads.MAX_SEGMENTS)
+
+    def test_lower_bound(self):
+        self.assertEqual(downloads.clamp_segments(-5), 1)
+        self.assertEqual(downloads.clamp_segments(1), 1)
+
+    def test_plan_respects_clamp(self):
+        total = 100 * downloads.MIN_SEGMENT_SIZE
+        plan = downloads.plan_segments([[0, total]], downloads.clamp_segments(10000))
+        self.assertLessEqual(len(plan), downloads.MAX_SEGMENTS)
+        self.assertEqual(sum(end - start for start, end in plan), total)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+# vdhcoapp_py/capabilities.py
+
+# Registro de capacidades de ffmpeg (versión, códecs, formatos, codificadores y
+# aceleración por hardware). ffmpeg se consulta una sola vez, en segundo plano tras el
+# arranque, y el resultado se guarda en disco asociado a la ruta y el mtime del
+# binario: los arranques siguientes responden sin lanzar ningún proceso.
+
+import os
+import re
+import sys
+import json
+import threading
+import subprocess
+
+from . import logger
+
+# --- CONFIGURACIÓN ---
+PROBE_TIMEOUT = 30 # Segundos máximos por consulta a ffmpeg
+CACHE_VERSION = 1 # Incrementar si cambia el formato guardado
+
+# Consultas a ffmpeg: {nombre: argumentos}
+QUERIES = {
+    "version": ["-version"],
+    "codecs": ["-hide_banner", "-codecs"],
+    "formats": ["-hide_banner", "-formats"],
+    "encoders": ["-hide_banner", "-encoders"],
+    "hwaccels": ["-hide_banner", "-hwaccels"]
+}
+
+CODEC_LINE = re.compile(r"^\s*([D.])([E.])([VASDT.])[I.][L.][S.]\s+(\S+)\s+(.*)$")
+FORMAT_LINE = re.compile(r"^\s*([D ])([E ])d?\s+(\S+)\s+(.*)$")
+ENCODER_LINE = re.compile(r"^\s*([VASD.])[F.][S.][X.][B.][D.]\s+(\S+)\s+(.*)$")
+CODEC_TYPES = {"V": "video", "A": "audio", "S": "subtitle", "D": "data", "T": "attachment"}
+
+registry = {} # {ruta de ffmpeg: capacidades}
+registry_lock = threading.Lock()
+probing = {} # {ruta de ffmpeg: threading.Event} de los sondeos en curso
+
+# --- CACHÉ EN DISCO ---
+
+def cache_path():
+    """Archivo de caché en el directorio de caché del usuario."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "vdhcoapp", "capabilities.json")
+
+def binary_key(ffmpeg):
+    """Identidad del binario: si se actualiza ffmpeg, cambia el mtime y se vuelve a sondear."""
+    st = os.stat(ffmpeg)
+    return {"path": os.path.realpath(ffmpeg), "mtime": st.st_mtime_ns, "size": st.st_size,
+            "version": CACHE_VERSION}
+
+def load_cached(key):
+    """Capacidades guardadas para este binario, o None."""
+    try:
+        with open(cache_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for item in data:
+            if item.get('key') == key:
+                return item['capabilities']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def save_cached(key, capabilities):
+    """Guarda las capacidades del binario, conservando las de otros binarios."""
+    path = cache_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = [item for item in json.load(f) if item.get('key', {}).get('path') != key['path']]
+    except (OSError, ValueError, AttributeError):
+        data = []
+    data.append({"key": key, "capabilities": capabilities})
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warn(f"No se pudo guardar la caché de capacidades en {path}: {e}")
+
+# --- PARSEO DE LA SALIDA DE FFMPEG ---
+
+def parse_version(output):
+    """Programa y versión a partir de 'ffmpeg -version'."""
+    if "ffmpeg version" not in output:
+        return None
+    words = output.split()
+    version_index = words.index("version") + 1
+    return {"program": words[version_index - 2], "version": words[version_index]}
+
+def table_lines(output):
+    """Líneas de la tabla que sigue al separador '-------' de ffmpeg."""
+    lines = output.splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().startswith("--"):
+            return lines[i + 1:]
+    return lines
+
+def parse_codecs(output):
+    """{códec: {type, decode, encode, description}} a partir de 'ffmpeg -codecs'."""
+    codecs = {}
+    for line in table_lines(output):
+        m = CODEC_LINE.match(line)
+        if m:
+            decode, encode, kind, name, description = m.groups()
+            codecs[name] = {"type": CODEC_TYPES.get(kind), "decode": decode == "D",
+                            "encode": encode == "E", "description": description.strip()}
+    return codecs
+
+def parse_formats(output):
+    """{formato: {demux, mux, description}} a partir de 'ffmpeg -formats'."""
+    formats = {}
+    for line in table_lines(output):
+        m = FORMAT_LINE.match(line)
+        if m:
+            demux, mux, names, description = m.groups()
+            for name in names.split(","):
+                formats[name] = {"demux": demux == "D", "mux": mux == "E",
+                                 "description": description.strip()}
+    return formats
+
+def parse_encoders(output):
+    """{codificador: {type, description}} a partir de 'ffmpeg -encoders'."""
+    encoders = {}
+    for line in table_lines(output):
+        m = ENCODER_LINE.match(line)
+        if m:
+            kind, name, description = m.groups()
+            encoders[name] = {"type": CODEC_TYPES.get(kind), "description": description.strip()}
+    return encoders
+
+def parse_hwaccels(output):
+    """Lista de métodos de 'ffmpeg -hwaccels'."""
+    lines = output.splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().endswith(":"):
+            return [l.strip() for l in lines[i + 1:] if l.strip()]
+    return [l.strip() for l in lines if l.strip()]
+
+# --- SONDEO ---
+
+def run_ffmpeg(ffmpeg, args):
+    """Salida combinada (stdout + stderr) de una consulta a ffmpeg."""
+    proc = subprocess.run([ffmpeg] + args, capture_output=True, timeout=PROBE_TIMEOUT)
+    return (proc.stdout + proc.stderr).decode('utf-8', 'replace')
+
+def probe(ffmpeg):
+    """Consulta a ffmpeg y devuelve sus capacidades (salidas en bruto y estructuradas)."""
+    raw = {name: run_ffmpeg(ffmpeg, args) for name, args in QUERIES.items()}
+    return {
+        "binary": ffmpeg,
+        **(parse_version(raw['version']) or {"program": None, "version": None}),
+        "codecs": parse_codecs(raw['codecs']),
+        "formats": parse_formats(raw['formats']),
+        "encoders": parse_encoders(raw['encoders']),
+        "hwaccels": parse_hwaccels(raw['hwaccels']),
+        "raw": raw
+    }
+
+def load(ffmpeg):
+    """Capacidades desde la caché en disco o sondeando ffmpeg; las registra en memoria."""
+    key = binary_key(ffmpeg)
+    capabilities = load_cached(key)
+    if capabilities is None:
+        capabilities = probe(ffmpeg)
+        save_cached(key, capabilities)
+    with registry_lock:
+        registry[ffmpeg] = capabilities
+    return capabilities
+
+def load_in_background(ffmpeg):
+    """Sondeo en un hilo; marca el Event al terminar (también si falla)."""
+    try:
+        load(ffmpeg)
+    except Exception as e:
+        logger.warn(f"No se pudieron obtener las capacidades de {ffmpeg}: {e}")
+    finally:
+        with registry_lock:
+            probing.pop(ffmpeg).set()
+
+def start(ffmpeg):
+    """Lanza el sondeo en segundo plano (si no está ya hecho o en curso)."""
+    with registry_lock:
+        if not ffmpeg or ffmpeg in registry or ffmpeg in probing:
+            return
+        probing[ffmpeg] = threading.Event()
+    threading.Thread(target=load_in_background, args=(ffmpeg,), daemon=True).start()
+
+def get(ffmpeg):
+    """
+    Capacidades de ffmpeg. Espera al sondeo en segundo plano si está en curso;
+    si no se lanzó (o falló), sondea ahora.
+    """
+    with registry_lock:
+        capabilities = registry.get(ffmpeg)
+        event = probing.get(ffmpeg)
+    if capabilities is not None:
+        return capabilities
+    if event:
+        event.wait(PROBE_TIMEOUT * len(QUERIES))
+        with registry_lock:
+            capabilities = registry.get(ffmpeg)
+        if capabilities is not None:
+            return capabilities
+    return load(ffmpeg)
+
+def refresh(ffmpeg):
+    """Descarta lo registrado y vuelve a sondear ffmpeg (p. ej. tras actualizarlo)."""
+    with registry_lock:
+        registry.pop(ffmpeg, None)
+    capabilities = probe(ffmpeg)
+    save_cached(binary_key(ffmpeg), capabilities)
+    with registry_lock:
+        registry[ffmpeg] = capabilities
+    return capabilities
+
+def summary(capabilities):
+    """Capacidades estructuradas sin las salidas en bruto (para el RPC)."""
+    return {k: v for k, v in capabilities.items() if k != "raw"}
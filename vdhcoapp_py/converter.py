@@ -9,12 +9,18 @@ import time
 import json
 import re
 import platform
+import heapq
+import shutil
+from collections import deque
 from concurrent.futures import Future
 import asyncio # Necesario para la función info()
 
 # Importaciones de módulos internos
 from . import rpc
 from . import logger
+from . import probe_cache
+from . import capabilities
+from . import hwaccel
 
 # ====================================================================
 # --- UTILERÍAS Y LÓGICA DE BÚSQUEDA DE BINARIOS ---
@@ -48,23 +54,52 @@ def find_executable_full_path(program_name, extra_path=""):
 # Obtener la ruta del directorio del ejecutable de Python (simulación de process.execPath)
 exec_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
 
-# Búsqueda de Binarios: Solo verificamos FFmpeg al inicio.
-ffmpeg = find_executable_full_path("ffmpeg", exec_dir)
-ffprobe = find_executable_full_path("ffprobe", exec_dir) 
-filepicker = find_executable_full_path("filepicker", exec_dir)
+# Búsqueda de Binarios: diferida hasta el primer uso y memorizada, para no recorrer
+# PATH en cada arranque de la CoApp (el navegador lanza un proceso por conexión).
+binaries = {} # {nombre: ruta completa o None}
+binaries_lock = threading.Lock()
 
+def find_binary(name):
+    """Ruta de un ejecutable junto a la CoApp o en PATH (None si no existe), memorizada."""
+    with binaries_lock:
+        if name not in binaries:
+            binaries[name] = find_executable_full_path(name, exec_dir)
+        return binaries[name]
 
-if not ffmpeg:
-    logger.error("ffmpeg no encontrado. Instale ffmpeg y asegúrese de que esté en su PATH.")
-    sys.exit(1)
+def require_binary(name):
+    """Como find_binary, pero lanza FileNotFoundError si el ejecutable no existe."""
+    path = find_binary(name)
+    if not path:
+        raise FileNotFoundError(f"{name} no encontrado. Instale {name} y asegúrese de que esté en su PATH.")
+    return path
 
 
 # --- LÓGICA DE PROCESOS Y CIERRE FORZADO ---
 
-def spawn_process(args, stdin_pipe=False):
-    """Ejecuta un proceso hijo y lo rastrea para terminarlo forzadamente."""
+BACKGROUND_NICE = 10 # Incremento de 'nice' de los procesos en segundo plano (Unix)
+
+def background_preexec():
+    """Nueva sesión y prioridad de CPU reducida para un proceso en segundo plano (Unix)."""
+    os.setsid()
+    os.nice(BACKGROUND_NICE)
+
+def spawn_process(args, stdin_pipe=False, background=False):
+    """
+    Ejecuta un proceso hijo y lo rastrea para terminarlo forzadamente.
+    Con background=True se ejecuta con prioridad baja de CPU y, si existe 'ionice',
+    de E/S (BELOW_NORMAL_PRIORITY_CLASS en Windows).
+    """
     # Usamos preexec_fn=os.setsid en Unix para que el proceso no reciba señales.
     preexec_fn = os.setsid if os.name == 'posix' else None
+    creationflags = 0
+    if background:
+        if os.name == 'posix':
+            preexec_fn = background_preexec
+            ionice = shutil.which("ionice")
+            if ionice:
+                args = [ionice, "-c", "3"] + list(args) # Clase "idle": solo E/S ociosa
+        else:
+            creationflags = getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0)
     
     process = subprocess.Popen(
         args,
@@ -72,7 +107,8 @@ def spawn_process(args, stdin_pipe=False):
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         close_fds=True,
-        preexec_fn=preexec_fn
+        preexec_fn=preexec_fn,
+        creationflags=creationflags
     )
     
     to_kill.add(process)
@@ -95,12 +131,18 @@ def exit_handler(*args):
             pass
     os._exit(0)
 
-# Registrar los manejadores de eventos (señales)
-for sig in (signal.SIGINT, signal.SIGTERM):
-    try:
-        signal.signal(sig, exit_handler)
-    except ValueError:
-        pass 
+def install_signal_handlers():
+    """
+    Registra exit_handler para SIGINT/SIGTERM, de modo que los procesos de ffmpeg no
+    queden huérfanos al cerrarse la CoApp. Python solo permite registrar señales desde
+    el hilo principal: main.py la llama antes de arrancar el bucle de mensajes (el
+    módulo puede importarse después en otro hilo por la carga diferida).
+    """
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, exit_handler)
+        except ValueError as e:
+            logger.warn(f"No se pudo registrar el manejador de la señal {sig.name}: {e}")
 
 # ====================================================================
 # --- FUNCIÓN DE INFORMACIÓN (info) ---
@@ -108,24 +150,17 @@ for sig in (signal.SIGINT, signal.SIGTERM):
 
 async def get_converter_info():
     """
-    Ejecuta 'ffmpeg -version' para obtener el programa y la versión.
-    Hecha asíncrona para compatibilidad con el marco RPC.
+    Programa y versión de FFmpeg, desde el registro de capacidades (sin lanzar
+    'ffmpeg -version' en cada llamada). Hecha asíncrona para compatibilidad con el marco RPC.
     """
-    # Usamos '-version' en lugar de '-h' para una salida más limpia y específica de la versión.
-    proc = spawn_process([ffmpeg, "-version"])
-    stdout, stderr = proc.communicate()
-    output = (stdout + stderr).decode('utf-8')
+    # Esperar al registro en un hilo para no bloquear el bucle asyncio del RPC
+    ffmpeg = require_binary("ffmpeg")
+    caps = await asyncio.to_thread(capabilities.get, ffmpeg)
     
-    if "ffmpeg version" in output:
-        words = output.split()
-        version_index = words.index("version") + 1
-        
-        version_str = words[version_index] 
-        program_name = words[version_index - 2]
-        
+    if caps.get("version"):
         return {
-            "program": program_name, 
-            "version": version_str,     
+            "program": caps["program"], 
+            "version": caps["version"],     
             "converterBinary": ffmpeg
         }
         
@@ -139,9 +174,330 @@ info = get_converter_info
 
 convert_children = {}
 
+# --- SEGUIMIENTO DE CONVERSIONES ---
+# ffmpeg escribe el progreso ('-progress pipe:1') en stdout como bloques clave=valor
+# terminados en 'progress=continue|end'. Un hilo lee esos bloques y otro vacía stderr
+# en un búfer circular, de modo que ninguna tubería se llena y bloquea a ffmpeg.
+STDERR_TAIL_LINES = 200 # Líneas de stderr conservadas por conversión
+STATUS_RETENTION = 60 # Segundos que el estado de una conversión terminada sigue consultable
+
+# --- COLA DE CONVERSIONES ---
+# Las conversiones esperan en una cola de prioridad ("queued") y arrancan ("running")
+# mientras haya menos de MAX_JOBS en curso; al terminar pasan a "done". Los núcleos se
+# reparten entre los trabajos simultáneos con '-threads', en lugar de que cada ffmpeg
+# intente usarlos todos.
+CPU_COUNT = os.cpu_count() or 2
+MAX_JOBS = max(1, CPU_COUNT // 2)
+jobs_lock = threading.Lock()
+jobs_queue = [] # heap de (-prioridad, secuencia, job_id)
+jobs_sequence = 0
+running_jobs = set() # IDs de trabajos en curso
+current_job_id = 0
+
+conversions = {} # {job_id: {id, pid, state, progress, stderr, exitCode, ...}}
+
+def threads_per_job():
+    """Hilos de ffmpeg por trabajo para repartir los núcleos entre MAX_JOBS trabajos."""
+    return max(1, CPU_COUNT // MAX_JOBS)
+
+def with_threads(args, threads):
+    """Añade '-threads N' antes del archivo de salida, salvo que ya venga en los argumentos."""
+    if "-threads" in args or not args:
+        return list(args)
+    return list(args[:-1]) + ["-threads", str(threads)] + list(args[-1:])
+
+def parse_number(value, suffix=""):
+    """Convierte '1.5x', '1234.5kbits/s' o 'N/A' en número (None si no es numérico)."""
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def parse_progress(fields):
+    """Normaliza un bloque de '-progress' (dict de cadenas) a los campos publicados."""
+    out_time_us = fields.get('out_time_us') or fields.get('out_time_ms') # out_time_ms va en µs
+    out_time_us = parse_number(out_time_us) if out_time_us else None
+    frame = parse_number(fields.get('frame', ""))
+    return {
+        "frame": int(frame) if frame is not None else None,
+        "fps": parse_number(fields.get('fps', "")),
+        "outTimeMs": int(out_time_us // 1000) if out_time_us is not None else None,
+        "speed": parse_number(fields.get('speed', ""), "x"),
+        "bitrate": parse_number(fields.get('bitrate', ""), "kbits/s"), # kbit/s
+        "totalSize": parse_number(fields.get('total_size', "")),
+        "progress": fields.get('progress')
+    }
+
+def read_progress(job, on_progress=None):
+    """Lee stdout de ffmpeg y publica cada bloque de progreso completo."""
+    fields = {}
+    for raw in job['process'].stdout:
+        line = raw.decode('utf-8', 'replace').strip()
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        fields[key.strip()] = value.strip()
+        if key == "progress":
+            job['progress'] = parse_progress(fields)
+            fields = {}
+            if on_progress:
+                on_progress(job['progress'])
+
+def drain_stderr(job):
+    """Vacía stderr de ffmpeg en el búfer circular del trabajo."""
+    for raw in job['process'].stderr:
+        job['stderr'].append(raw.decode('utf-8', 'replace').rstrip())
+
+def monitor_conversion(job, on_progress=None):
+    """Sigue una conversión hasta que ffmpeg termina y resuelve job['future']."""
+    process = job['process']
+    stderr_thread = threading.Thread(target=drain_stderr, args=(job,), daemon=True)
+    stderr_thread.start()
+    try:
+        read_progress(job, on_progress)
+    except Exception as e:
+        logger.warn(f"Error al leer el progreso de la conversión {job['pid']}: {e}")
+    stderr_thread.join()
+    job['exitCode'] = process.wait()
+    convert_children.pop(job['pid'], None)
+    if job['accel'] and job['exitCode'] != 0 and not job['aborted'] and not (job['progress'] or {}).get('frame'):
+        fallback_to_software(job)
+        return
+    finish_job(job, {"exitCode": job['exitCode'], "stderr": "\n".join(job['stderr'])})
+
+def select_acceleration(args):
+    """Argumentos de codificación por hardware para una conversión (None si no procede)."""
+    try:
+        accel = hwaccel.accelerate(args, capabilities.get(require_binary("ffmpeg")))
+    except Exception as e:
+        logger.warn(f"No se pudo preparar la aceleración por hardware: {e}")
+        return None
+    if accel:
+        accel['outputExisted'] = bool(args) and os.path.exists(args[-1])
+    return accel
+
+def fallback_to_software(job):
+    """El intento por hardware falló antes de codificar ningún fotograma: repetir por software."""
+    accel = job['accel']
+    hwaccel.mark_failed(accel['encoders'])
+    logger.warn(f"La codificación por hardware ({', '.join(accel['encoders'])}) falló al arrancar "
+                f"(código {job['exitCode']}); se repite la conversión por software.")
+    job['fallback'] = {"backend": accel['backend'], "encoders": accel['encoders'],
+                       "exitCode": job['exitCode'], "stderr": list(job['stderr'])[-20:]}
+    job['accel'] = None
+    job['progress'] = None
+    job['exitCode'] = None
+    job['stderr'].clear()
+    # El intento fallido puede haber creado ya el archivo de salida: sin -y, ffmpeg
+    # esperaría la confirmación por stdin. Solo se sobrescribe si no existía antes.
+    if not accel['outputExisted'] and "-y" not in job['args'] and "-n" not in job['args']:
+        job['args'] = ["-y"] + job['args']
+    start_job(job)
+
+def finish_job(job, result=None, error=None):
+    """Marca un trabajo como terminado, resuelve su Future y arranca el siguiente."""
+    job['state'] = "done"
+    job['finished'] = time.time()
+    with jobs_lock:
+        running_jobs.discard(job['id'])
+    # El Future ya está cancelado si la petición RPC se canceló mientras esperaba
+    if not job['future'].done():
+        if error:
+            job['future'].set_exception(error)
+        else:
+            job['future'].set_result(result)
+    threading.Thread(target=remove_conversion, args=(job['id'],), daemon=True).start()
+    schedule_jobs()
+
+def remove_conversion(job_id):
+    """Olvida el estado de una conversión terminada tras STATUS_RETENTION segundos."""
+    time.sleep(STATUS_RETENTION)
+    conversions.pop(job_id, None)
+
+def start_job(job):
+    """Lanza ffmpeg para un trabajo y su hilo de seguimiento."""
+    ffmpeg_base_args = ["-progress", "pipe:1", "-hide_banner", "-loglevel", "error"]
+    if job['accel'] and hwaccel.has_failed(job['accel']['encoders']):
+        job['accel'] = None # Falló en otra conversión mientras este trabajo esperaba
+    args = job['accel']['args'] if job['accel'] else job['args']
+    full_args = ffmpeg_base_args + with_threads(args, job['threads'])
+    try:
+        child = spawn_process([require_binary("ffmpeg")] + full_args, stdin_pipe=True, background=job['background'])
+        if not child.pid:
+            raise Exception("Fallo en la creación del proceso.")
+    except Exception as e:
+        finish_job(job, error=e)
+        return
+
+    job['pid'] = child.pid
+    job['process'] = child
+    job['started'] = time.time()
+    convert_children[child.pid] = child
+
+    options = job['options']
+    if options.get('startHandler'):
+        rpc.notify(options['startHandler'], {"pid": child.pid})
+    on_progress = None
+    if options.get('progressTime'):
+        on_progress = lambda progress: rpc.notify(options['progressTime'], {"pid": child.pid, **progress})
+
+    threading.Thread(target=monitor_conversion, args=(job, on_progress), daemon=True).start()
+
+def schedule_jobs():
+    """Arranca trabajos de la cola mientras haya menos de MAX_JOBS en curso."""
+    to_start = []
+    with jobs_lock:
+        while jobs_queue and len(running_jobs) < MAX_JOBS:
+            job = conversions.get(heapq.heappop(jobs_queue)[2])
+            if not job or job['state'] != "queued":
+                continue # Cancelado mientras esperaba
+            job['state'] = "running"
+            running_jobs.add(job['id'])
+            to_start.append(job)
+
+    for job in to_start:
+        start_job(job)
+
+def enqueue_job(args, options, accel=None):
+    """
+    Registra un trabajo de conversión en la cola y devuelve su estado interno.
+    accel: resultado de select_acceleration (argumentos por hardware) o None.
+    """
+    global current_job_id, jobs_sequence
+    priority = int(options.get('priority') or 0)
+    with jobs_lock:
+        current_job_id += 1
+        jobs_sequence += 1
+        job = conversions[current_job_id] = {
+            "id": current_job_id,
+            "pid": None,
+            "process": None,
+            "args": list(args),
+            "options": options,
+            "priority": priority,
+            "threads": max(1, int(options.get('threads') or threads_per_job())),
+            "background": bool(options.get('background')),
+            "accel": accel,
+            "fallback": None,
+            "aborted": False,
+            "state": "queued",
+            "progress": None,
+            "stderr": deque(maxlen=STDERR_TAIL_LINES),
+            "queued": time.time(),
+            "started": None,
+            "finished": None,
+            "exitCode": None,
+            "future": Future()
+        }
+        # heapq es un min-heap: se niega la prioridad y se desempata por orden de llegada
+        heapq.heappush(jobs_queue, (-priority, jobs_sequence, job['id']))
+    schedule_jobs()
+    return job
+
+def find_job(job_id=None, pid=None):
+    """Busca un trabajo por id o por pid de ffmpeg."""
+    if job_id is not None and job_id in conversions:
+        return conversions[job_id]
+    for job in list(conversions.values()):
+        if job['pid'] is not None and job['pid'] in (pid, job_id):
+            return job
+    return None
+
+def conversion_status(job):
+    """Estado público de una conversión."""
+    return {
+        "id": job['id'],
+        "pid": job['pid'],
+        "state": job['state'],
+        "priority": job['priority'],
+        "threads": job['threads'],
+        "background": job['background'],
+        "accelerated": job['accel'] and {k: job['accel'][k] for k in ("backend", "encoders", "hwaccel")},
+        "fallback": job['fallback'],
+        "progress": job['progress'],
+        "queued": job['queued'],
+        "started": job['started'],
+        "finished": job['finished'],
+        "exitCode": job['exitCode'],
+        "stderr": list(job['stderr'])[-20:]
+    }
+
+# --- SONDEO ESTRUCTURADO (ffprobe) ---
+# Solo se piden a ffprobe los campos necesarios (-show_entries), en JSON, en una
+# única ejecución; el resultado se reduce a un diccionario compacto.
+PROBE_ENTRIES = (
+    "format=duration,bit_rate,format_name"
+    ":stream=index,codec_type,codec_name,profile,width,height,avg_frame_rate,r_frame_rate,"
+    "bit_rate,channels,sample_rate"
+    ":stream_tags=language"
+)
+
+def parse_rate(value):
+    """Convierte una tasa de fotogramas de ffprobe ('30000/1001', '25') a float."""
+    try:
+        num, _, den = str(value).partition("/")
+        num, den = float(num), float(den or 1)
+        return round(num / den, 3) if num and den else None
+    except ValueError:
+        return None
+
+def parse_int(value):
+    """Entero de un campo de ffprobe, o None si falta o es 'N/A'."""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def summarize_probe(data):
+    """Reduce la salida JSON de ffprobe a duración, streams, códecs, resolución, bitrate, fps y canales."""
+    fmt = data.get('format', {})
+    streams = []
+    for stream in data.get('streams', []):
+        kind = stream.get('codec_type')
+        info = {
+            "index": stream.get('index'),
+            "type": kind,
+            "codec": stream.get('codec_name'),
+            "profile": stream.get('profile'),
+            "bitrate": parse_int(stream.get('bit_rate')),
+            "language": stream.get('tags', {}).get('language')
+        }
+        if kind == "video":
+            info.update({
+                "width": stream.get('width'),
+                "height": stream.get('height'),
+                "fps": parse_rate(stream.get('avg_frame_rate')) or parse_rate(stream.get('r_frame_rate'))
+            })
+        elif kind == "audio":
+            info.update({
+                "channels": stream.get('channels'),
+                "sampleRate": parse_int(stream.get('sample_rate'))
+            })
+        streams.append({k: v for k, v in info.items() if v is not None})
+
+    video = next((st for st in streams if st['type'] == "video"), {})
+    audio = next((st for st in streams if st['type'] == "audio"), {})
+    duration = fmt.get('duration')
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else 0,
+        "bitrate": parse_int(fmt.get('bit_rate')),
+        "format": fmt.get('format_name'),
+        "videoCodec": video.get('codec', "unknown"),
+        "audioCodec": audio.get('codec'),
+        "width": video.get('width'),
+        "height": video.get('height'),
+        "resolution": f"{video['width']}x{video['height']}" if video.get('width') else None,
+        "fps": video.get('fps'),
+        "audioChannels": audio.get('channels'),
+        "streams": streams
+    }
+
 def exec_converter(args):
     """Ejecuta FFmpeg de forma síncrona y devuelve stdout."""
-    proc = spawn_process([ffmpeg] + args)
+    proc = spawn_process([require_binary("ffmpeg")] + args)
     stdout, stderr = proc.communicate()
     
     if proc.returncode != 0:
@@ -155,6 +511,7 @@ def star_listening():
 
     def rpc_filepicker(action, directory, title, filename=None):
         """Implementa la llamada al ejecutable filepicker."""
+        filepicker = find_binary("filepicker")
         if not filepicker:
              raise FileNotFoundError("El ejecutable 'filepicker' no fue encontrado.")
              
@@ -171,6 +528,9 @@ def star_listening():
             
     def rpc_abort_convert(pid):
         """Termina un proceso de conversión activo."""
+        job = find_job(pid=pid)
+        if job:
+            job['aborted'] = True # No repetir por software una conversión detenida
         child = convert_children.get(pid)
         if child and child.poll() is None:
             try:
@@ -184,52 +544,82 @@ def star_listening():
                 child.kill()
                 logger.warn(f"Proceso de conversión {pid} terminado forzadamente.")
 
-    def rpc_convert(args, options={}):
-        """Ejecuta la conversión con FFmpeg y maneja el progreso (lógica omitida por simplicidad, devuelve solo inicio)."""
-        # Esta función es la más compleja. Aquí solo se implementa el inicio.
-        ffmpeg_base_args = ["-progress", "pipe:1", "-hide_banner", "-loglevel", "error"]
-        full_args = ffmpeg_base_args + args
-        
-        child = spawn_process([ffmpeg] + full_args, stdin_pipe=True)
-                
-        if not child.pid:
-            raise Exception("Fallo en la creación del proceso.")
-            
-        convert_children[child.pid] = child
-        
-        # En una implementación real, aquí se iniciaría un hilo para monitor_conversion.
-        
-        return {"pid": child.pid, "status": "started"} 
+    async def rpc_convert(args, options={}):
+        """
+        Encola la conversión con FFmpeg y resuelve con {exitCode, stderr} al terminar.
+        options: priority (mayor = antes), threads (por defecto, el reparto de núcleos),
+        background (prioridad baja de CPU/E/S), startHandler (recibe {pid} al arrancar)
+        y progressTime (recibe cada bloque de progreso). Con autoAccelerate se codifica
+        por hardware si ffmpeg lo permite (con vuelta a software si falla al arrancar).
+        El estado se consulta con converter.status.
+        """
+        accel = None
+        if options.get('autoAccelerate'):
+            accel = await asyncio.to_thread(select_acceleration, args)
+        job = enqueue_job(args, options, accel)
+        try:
+            return await asyncio.wrap_future(job['future'])
+        except asyncio.CancelledError:
+            # Petición cancelada por la extensión: sacar de la cola o detener ffmpeg
+            if job['state'] == "queued":
+                finish_job(job, error=Exception("Conversión cancelada"))
+            elif job['pid']:
+                await asyncio.to_thread(rpc_abort_convert, job['pid'])
+            raise
+
+    def rpc_status(job_id=None):
+        """Estado de una conversión por id de trabajo (o pid), o de todas si no se indica."""
+        if job_id is None:
+            return [conversion_status(job) for job in list(conversions.values())]
+        job = find_job(job_id)
+        return conversion_status(job) if job else None
+
+    def rpc_set_concurrency(options):
+        """Ajusta las conversiones simultáneas: {max}. Los trabajos en cola arrancan si caben."""
+        global MAX_JOBS
+        if options.get('max'):
+            MAX_JOBS = max(1, int(options['max']))
+        schedule_jobs()
+        return {"max": MAX_JOBS, "threadsPerJob": threads_per_job(), "cpuCount": CPU_COUNT}
 
     def rpc_probe(input_file, json_output=False, headers=[]):
-        """Implementa la función de sondeo con FFprobe."""
+        """
+        Implementa la función de sondeo con FFprobe.
+        Los resultados se guardan en probe_cache: un archivo sin cambios o una URL
+        sondeada hace poco no vuelven a lanzar ffprobe.
+        """
+        ffprobe = find_binary("ffprobe")
         if not ffprobe:
              raise FileNotFoundError("El ejecutable 'ffprobe' no fue encontrado.")
-             
-        args = []
-        if json_output:
-            args.extend(["-v", "quiet", "-print_format", "json", "-show_format", "-show_streams"])
-        
-        if headers:
-            header_str = "\r\n".join([f"{h['name']}: {h['value']}" for h in headers]) + "\r\n"
-            args.extend(["-headers", header_str])
-                
-        args.append(input_file)
-                
-        proc = spawn_process([ffprobe] + args)
-        stdout, stderr = proc.communicate()
-                
-        if proc.returncode != 0:
-            raise Exception(f"Código de salida: {proc.returncode}\n{stderr.decode()}")
-                
-        stdout = stdout.decode('utf-8')
-        stderr = stderr.decode('utf-8')
-                
-        if json_output:
-            return stdout
-        else:
-            # Lógica de parseo simple del stderr (omitida)
-            return {"duration": 0, "videoCodec": "unknown"}
+
+        def run_probe():
+            args = []
+            if json_output:
+                args.extend(["-v", "quiet", "-print_format", "json", "-show_format", "-show_streams"])
+            else:
+                args.extend(["-v", "error", "-print_format", "json", "-show_entries", PROBE_ENTRIES])
+            
+            if headers:
+                header_str = "\r\n".join([f"{h['name']}: {h['value']}" for h in headers]) + "\r\n"
+                args.extend(["-headers", header_str])
+                    
+            args.append(input_file)
+                    
+            proc = spawn_process([ffprobe] + args)
+            stdout, stderr = proc.communicate()
+                    
+            if proc.returncode != 0:
+                raise Exception(f"Código de salida: {proc.returncode}\n{stderr.decode()}")
+                    
+            stdout = stdout.decode('utf-8')
+            stderr = stderr.decode('utf-8')
+                    
+            if json_output:
+                return stdout
+            else:
+                return summarize_probe(json.loads(stdout or "{}"))
+
+        return probe_cache.cached(input_file, headers, "json" if json_output else "entries", run_probe)
 
     def rpc_open(file_path, options={}):
         """Abre un archivo con el programa por defecto del sistema."""
@@ -242,21 +632,36 @@ def star_listening():
         return rpc_open(file_path)
 
     def rpc_codecs():
-        """Obtiene la lista de códecs soportados por FFmpeg."""
-        return exec_converter(["-codecs"]) 
+        """Obtiene la lista de códecs soportados por FFmpeg (salida de 'ffmpeg -codecs')."""
+        return capabilities.get(require_binary("ffmpeg"))["raw"]["codecs"]
 
     def rpc_formats():
-        """Obtiene la lista de formatos soportados por FFmpeg."""
-        return exec_converter(["-formats"])
+        """Obtiene la lista de formatos soportados por FFmpeg (salida de 'ffmpeg -formats')."""
+        return capabilities.get(require_binary("ffmpeg"))["raw"]["formats"]
+
+    def rpc_capabilities(refresh=False):
+        """Capacidades estructuradas: versión, códecs, formatos, codificadores y hwaccels."""
+        ffmpeg = require_binary("ffmpeg")
+        caps = capabilities.refresh(ffmpeg) if refresh else capabilities.get(ffmpeg)
+        return {**capabilities.summary(caps), "accelerators": hwaccel.available(caps)}
+
+    # Sondear las capacidades de ffmpeg en segundo plano (o leerlas de la caché en disco)
+    capabilities.start(find_binary("ffmpeg"))
 
     # Registrar todos los métodos RPC en la capa RPC
     rpc.listen({
         "converter.filepicker": rpc_filepicker,
         "converter.abortConvert": rpc_abort_convert,
         "converter.convert": rpc_convert,
+        "converter.status": rpc_status,
+        "converter.setConcurrency": rpc_set_concurrency,
         "converter.probe": rpc_probe,
         "converter.play": rpc_play,
         "converter.codecs": rpc_codecs,
         "converter.formats": rpc_formats,
+        "converter.capabilities": rpc_capabilities,
         "converter.open": rpc_open,
-    })
\ No newline at end of file
+    })
+
+# main.py registra los métodos con este nombre
+start_listening = star_listening
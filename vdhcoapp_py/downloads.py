@@ -3,13 +3,20 @@
 import os
 # import path
 import re
+import json
 import threading
 import time
-import requests
+import heapq
 import sys
+import asyncio
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from . import rpc
 from . import logger
+from . import transport
+from . import throttle
+from .request_ops import get_got_proxy
 
 # --- CONFIGURACIÓN Y ESTADO ---
 download_folder = os.path.join(os.path.expanduser("~"), "dwhelper")
@@ -17,9 +24,45 @@ current_download_id = 0
 downloads = {} # {id: {downloadItem: requests.Response, ...}}
 
 NAME_PATTERN = re.compile(r"/([^/]+?)(?:\.([a-z0-9]{1,5}))?(?:\?|#|$)")
+CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+CHUNK_SIZE = 8192
+DEFAULT_SEGMENTS = 4 # Conexiones paralelas por descarga si el servidor admite rangos
+MAX_SEGMENTS = 16 # Tope de conexiones 'Range' simultáneas de una descarga al mismo host
+MIN_SEGMENT_SIZE = 1024 * 1024 # No dividir en segmentos de menos de 1 MB
+JOURNAL_SUFFIX = ".vdhpart" # Journal de reanudación junto al archivo destino
+JOURNAL_INTERVAL = 1.0 # Segundos mínimos entre escrituras del journal
+
+# Planificador: límites de descargas simultáneas (globales y por host)
+MAX_CONCURRENT_DOWNLOADS = 6
+MAX_PER_HOST = 2
+scheduler_lock = threading.Lock()
+pending_queue = [] # heap de (-prioridad, secuencia, dl_id)
+queue_sequence = 0
+running = set() # IDs de descargas activas
+active_hosts = {} # {host: descargas activas}
+
+# Seguimiento en streaming (downloads.watch): los cambios de estado despiertan a los
+# observadores al instante; el avance de bytes se envía como mucho cada WATCH_INTERVAL.
+# Los observadores RPC esperan un asyncio.Event en el bucle (no ocupan hilos del pool);
+# el observador síncrono del CLI espera la Condition.
+WATCH_INTERVAL = 0.5
+progress = threading.Condition()
+watchers = set() # {(bucle, asyncio.Event)} de los downloads.watch abiertos
 
 # --- FUNCIONES DE ASISTENCIA ---
 
+def transfer_options(options):
+    """
+    Opciones de conexión de una descarga para transport: encabezados, certificado SSL
+    (rejectUnauthorized) y proxy. Las comparten las descargas HTTP y las de streams.
+    """
+    return {
+        'headers': get_got_headers(options.get('headers', [])),
+        'verify': options.get('rejectUnauthorized', True),
+        'proxies': get_got_proxy(options.get('proxy'))
+    }
+
 def get_got_headers(headers_list):
     """Convierte la lista de encabezados del RPC a un diccionario para requests."""
     got_headers = {}
@@ -37,119 +80,498 @@ def get_got_headers(headers_list):
             got_headers[name] = header['binaryValue'] # Si es byte literal, requests lo maneja.
     return got_headers
 
+# --- JOURNAL DE REANUDACIÓN ---
+# Archivo auxiliar junto al destino: {url, etag, lastModified, totalBytes, ranges}
+# donde 'ranges' es la lista de rangos [inicio, fin) ya escritos en disco.
+
+def journal_path(file_path):
+    """Ruta del journal asociado a un archivo de descarga."""
+    return file_path + JOURNAL_SUFFIX
+
+def load_journal(file_path):
+    """Lee el journal de una descarga previa, o None si no existe o es inválido."""
+    try:
+        with open(journal_path(file_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def merge_ranges(ranges):
+    """Fusiona rangos [inicio, fin) solapados o contiguos."""
+    merged = []
+    for start, end in sorted(r for r in ranges if r[1] > r[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def missing_ranges(completed, total):
+    """Calcula los rangos [inicio, fin) que faltan por descargar en [0, total)."""
+    missing = []
+    position = 0
+    for start, end in merge_ranges(completed):
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < total:
+        missing.append([position, total])
+    return missing
+
+def save_journal(entry):
+    """Escribe el journal de forma atómica con los rangos completados hasta ahora."""
+    with entry['lock']:
+        ranges = entry['done'] + [[seg[0], seg[2]] for seg in entry['segments']]
+        journal = {
+            "url": entry['url'],
+            "etag": entry['etag'],
+            "lastModified": entry['lastModified'],
+            "totalBytes": entry['totalBytes'],
+            "ranges": merge_ranges(ranges)
+        }
+        entry['journalSaved'] = time.monotonic()
+
+    tmp_path = journal_path(entry['filename']) + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(journal, f)
+        os.replace(tmp_path, journal_path(entry['filename']))
+    except OSError as e:
+        logger.warn(f"No se pudo guardar el journal de {entry['filename']}: {e}")
+
+def remove_journal(file_path):
+    """Elimina el journal una vez completada la descarga."""
+    try:
+        os.unlink(journal_path(file_path))
+    except OSError:
+        pass
+
+# --- DESCARGA SEGMENTADA (HTTP Range) ---
+
+def probe_ranges(url, dl_options):
+    """
+    Sondea el servidor con una petición 'Range: bytes=0-0' para saber si
+    admite rangos y obtener el tamaño total y los validadores del recurso.
+
+    Returns:
+        dict: {total, ranges, etag, lastModified}
+    """
+    headers = dict(dl_options['headers'])
+    headers['Range'] = "bytes=0-0"
+    probe_options = {**dl_options, 'headers': headers}
+
+    with transport.get(url, **probe_options) as r:
+        r.raise_for_status()
+        result = {
+            "total": None,
+            "ranges": False,
+            "etag": r.headers.get('etag'),
+            "lastModified": r.headers.get('last-modified')
+        }
+        if r.status_code == 206:
+            # Content-Range: bytes 0-0/12345
+            m = CONTENT_RANGE_PATTERN.match(r.headers.get('content-range', ''))
+            if m:
+                result.update(total=int(m.group(1)), ranges=True)
+        else:
+            content_length = r.headers.get('content-length')
+            if content_length:
+                result['total'] = int(content_length)
+        return result
+
+def split_ranges(start, end, count):
+    """Divide [start, end) en hasta 'count' rangos [inicio, fin) contiguos."""
+    total = end - start
+    count = max(1, min(count, total // MIN_SEGMENT_SIZE or 1))
+    size = total // count
+    ranges = []
+    for i in range(count):
+        seg_start = start + i * size
+        seg_end = end if i == count - 1 else seg_start + size
+        ranges.append([seg_start, seg_end])
+    return ranges
+
+def clamp_segments(segments):
+    """Número de conexiones pedido por la extensión, limitado a [1, MAX_SEGMENTS]."""
+    return max(1, min(int(segments or DEFAULT_SEGMENTS), MAX_SEGMENTS))
+
+def plan_segments(missing, segments):
+    """Reparte las conexiones disponibles entre los huecos pendientes según su tamaño."""
+    total_missing = sum(end - start for start, end in missing)
+    plan = []
+    for start, end in missing:
+        share = max(1, round(segments * (end - start) / total_missing))
+        plan.extend(split_ranges(start, end, share))
+    return plan
+
+def notify_progress():
+    """Despierta a los observadores de downloads.watch tras un cambio de estado."""
+    with progress:
+        progress.notify_all()
+        current_watchers = list(watchers)
+    for loop, changed in current_watchers:
+        try:
+            loop.call_soon_threadsafe(changed.set)
+        except RuntimeError:
+            pass # Bucle ya cerrado
+
+def add_received(entry, segment, length):
+    """Acumula bytes recibidos de forma segura entre hilos de segmento."""
+    with entry['lock']:
+        entry['bytesReceived'] += length
+        segment[2] += length
+        due = time.monotonic() - entry['journalSaved'] >= JOURNAL_INTERVAL
+    if due:
+        save_journal(entry)
+
+def fetch_segment(entry, dl_options, segment):
+    """Descarga el segmento [inicio, fin) y lo escribe en su desplazamiento del archivo."""
+    start, end = segment[0], segment[1]
+    headers = dict(dl_options['headers'])
+    headers['Range'] = f"bytes={start}-{end - 1}"
+
+    with transport.get(entry['url'], **{**dl_options, 'headers': headers}) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise Exception(f"El servidor ignoró el rango {start}-{end - 1} (HTTP {r.status_code})")
+
+        with open(entry['filename'], 'r+b') as f:
+            f.seek(start)
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if entry['state'] == "interrupted": # Chequeo de cancelación
+                    return
+                if chunk:
+                    f.write(chunk)
+                    add_received(entry, segment, len(chunk))
+                    throttle.throttle(entry['limiter'], len(chunk))
+
+def prepare_resume(entry, info):
+    """
+    Recupera los rangos completados del journal si sigue siendo válido para el
+    recurso remoto. Devuelve la lista de rangos completados (vacía si se reinicia).
+    """
+    journal = load_journal(entry['filename'])
+    if not journal:
+        return []
+
+    same_resource = (
+        journal.get('totalBytes') == info['total']
+        and journal.get('etag') == info['etag']
+        and journal.get('lastModified') == info['lastModified']
+    )
+    try:
+        same_file = os.path.getsize(entry['filename']) == info['total']
+    except OSError:
+        same_file = False
+
+    if not (same_resource and same_file):
+        logger.warn(f"Journal de {entry['filename']} no coincide con el recurso remoto; se reinicia la descarga.")
+        return []
+    return merge_ranges(journal.get('ranges', []))
+
+def segmented_download(entry, dl_options, info, segments, resume):
+    """Descarga el archivo en paralelo con conexiones 'Range', llevando un journal."""
+    total = info['total']
+    entry['totalBytes'] = total
+    entry['etag'] = info['etag']
+    entry['lastModified'] = info['lastModified']
+
+    completed = prepare_resume(entry, info) if resume else []
+    if not completed:
+        # Preasignar el archivo para que cada segmento escriba en su desplazamiento
+        with open(entry['filename'], 'wb') as f:
+            f.truncate(total)
+
+    entry['done'] = completed
+    entry['bytesReceived'] = sum(end - start for start, end in completed)
+    missing = missing_ranges(completed, total)
+    # Cada segmento es [inicio, fin, posición]; la posición avanza al escribir
+    entry['segments'] = [[start, end, start] for start, end in plan_segments(missing, segments)] if missing else []
+    save_journal(entry)
+
+    if not entry['segments']:
+        return
+
+    # Al reanudar puede haber más huecos que conexiones: nunca más de 'segments' a la vez
+    with ThreadPoolExecutor(max_workers=min(len(entry['segments']), segments)) as executor:
+        futures = [executor.submit(fetch_segment, entry, dl_options, segment)
+                   for segment in entry['segments']]
+        for future in as_completed(futures):
+            error = future.exception()
+            if error:
+                # Detener el resto de segmentos antes de propagar el error
+                entry['state'] = "interrupted"
+                entry['error'] = str(error)
+                raise error
+
+def stream_download(entry, dl_options):
+    """Descarga el archivo con un único stream (servidores sin soporte de rangos)."""
+    with transport.get(entry['url'], **dl_options) as r:
+        r.raise_for_status()
+
+        # Obtener Content-Length y configurar la descarga
+        content_length = r.headers.get('content-length')
+        if content_length:
+            entry['totalBytes'] = int(content_length)
+
+        # Escribir al archivo
+        with open(entry['filename'], 'wb') as f:
+            entry['file_stream'] = f
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if entry['state'] == "interrupted": # Chequeo de cancelación
+                    break
+                if chunk:
+                    f.write(chunk)
+                    entry['bytesReceived'] += len(chunk)
+                    throttle.throttle(entry['limiter'], len(chunk))
+
+def remove_entry(dl_id):
+    """Elimina la entrada después de un tiempo (60s)"""
+    time.sleep(60)
+    downloads.pop(dl_id, None)
+
+def failed_download(dl_id, err):
+    """Marca la descarga como interrumpida, conservando el journal para reanudarla."""
+    entry = downloads[dl_id]
+    if entry.get('state') != "complete":
+        entry['state'] = "interrupted"
+        entry['error'] = entry['error'] or str(err)
+        if entry['file_stream']:
+            entry['file_stream'].close()
+        if entry['segments']:
+            save_journal(entry)
+        notify_progress()
+        threading.Thread(target=remove_entry, args=(dl_id,)).start()
+
+def http_transfer(entry, dl_options, segments, resume):
+    """Transferencia HTTP: por rangos si el servidor los admite, stream único si no."""
+    info = {"total": None, "ranges": False}
+    try:
+        info = probe_ranges(entry['url'], dl_options)
+    except Exception as e:
+        logger.warn(f"Sondeo de rangos fallido para {entry['url']}: {e}")
+
+    if info['ranges'] and info['total']:
+        segmented_download(entry, dl_options, info, segments, resume)
+    else:
+        if resume:
+            logger.warn(f"El servidor no admite rangos; {entry['url']} se descarga desde el inicio.")
+        stream_download(entry, dl_options)
+
+def download_thread(dl_id, transfer):
+    """
+    Lógica real de descarga que se ejecuta en un hilo.
+    'transfer(entry)' realiza la transferencia (HTTP directo, HLS, DASH...).
+    """
+    entry = downloads[dl_id]
+
+    # 1. Crear el directorio si no existe
+    try:
+        os.makedirs(os.path.dirname(entry['filename']), exist_ok=True)
+    except Exception as e:
+        failed_download(dl_id, e)
+        return
+
+    # 2. Transferir
+    try:
+        transfer(entry)
+
+        # 3. Finalizar
+        if entry['state'] != "interrupted":
+            entry['state'] = "complete"
+            remove_journal(entry['filename'])
+            # Lógica ECONNRESET de downloads.js no implementada, pero se puede añadir
+            # si se detecta un error de conexión después de que se ha descargado todo.
+            threading.Thread(target=remove_entry, args=(dl_id,)).start()
+        elif entry['segments']:
+            # Cancelada: conservar el progreso para una reanudación posterior
+            save_journal(entry)
+
+        entry['file_stream'] = None # Liberar referencia
+        notify_progress()
+
+    except Exception as e:
+        failed_download(dl_id, e)
+
+# --- PLANIFICADOR DE DESCARGAS ---
+# Cola de prioridad con un límite global de descargas simultáneas y otro por host.
+# Las descargas esperan en estado "queued" y arrancan a medida que se liberan huecos.
+
+def start_entry(dl_id):
+    """Ejecuta la descarga en su hilo y libera el hueco del planificador al terminar."""
+    entry = downloads[dl_id]
+
+    def run():
+        try:
+            entry['run']()
+        finally:
+            release_slot(dl_id)
+
+    t = threading.Thread(target=run)
+    entry['thread'] = t
+    t.start()
+
+def schedule_pending():
+    """Arranca descargas de la cola mientras haya huecos globales y por host."""
+    to_start = []
+    with scheduler_lock:
+        deferred = []
+        while pending_queue and len(running) < MAX_CONCURRENT_DOWNLOADS:
+            item = heapq.heappop(pending_queue)
+            dl_id = item[2]
+            entry = downloads.get(dl_id)
+            if not entry or entry['state'] != "queued":
+                continue # Cancelada mientras esperaba
+            host = entry['host']
+            if active_hosts.get(host, 0) >= MAX_PER_HOST:
+                deferred.append(item)
+                continue
+            active_hosts[host] = active_hosts.get(host, 0) + 1
+            running.add(dl_id)
+            entry['state'] = "in_progress"
+            to_start.append(dl_id)
+        for item in deferred:
+            heapq.heappush(pending_queue, item)
+
+    for dl_id in to_start:
+        start_entry(dl_id)
+    if to_start:
+        notify_progress()
+
+def release_slot(dl_id):
+    """Libera el hueco de una descarga terminada y arranca la siguiente de la cola."""
+    with scheduler_lock:
+        if dl_id in running:
+            running.discard(dl_id)
+            host = downloads[dl_id]['host'] if dl_id in downloads else None
+            if host in active_hosts:
+                active_hosts[host] -= 1
+                if active_hosts[host] <= 0:
+                    del active_hosts[host]
+    schedule_pending()
+
+def enqueue_download(dl_id, priority=0):
+    """Encola una descarga (mayor prioridad = antes) e intenta arrancarla."""
+    global queue_sequence
+    with scheduler_lock:
+        queue_sequence += 1
+        # heapq es un min-heap: se niega la prioridad y se desempata por orden de llegada
+        heapq.heappush(pending_queue, (-priority, queue_sequence, dl_id))
+    schedule_pending()
+
 # --- MÉTODOS RPC DE DESCARGA ---
 
-def rpc_download(options):
+def default_filename(url, extension=None):
+    """Deduce un nombre de archivo a partir de la URL (opcionalmente con otra extensión)."""
+    m = NAME_PATTERN.search(url)
+    if not m:
+        return "file" + (f".{extension}" if extension else "")
+    if extension:
+        return f"{m.group(1)}.{extension}"
+    # Replicar la lógica de nombramiento de downloads.js
+    return m.group(1) + (m.group(2) if m.group(2) else '')
+
+def add_download(options, file_path, transfer, **fields):
     """
-    Inicia una descarga HTTP asíncrona en un hilo separado.
-    Reemplaza downloads.download en downloads.js
+    Crea la entrada de una descarga y la encola en el planificador.
+    'transfer(entry)' se ejecutará en el hilo de descarga; 'fields' añade
+    campos propios del tipo de descarga a la entrada.
     """
     global current_download_id
     global downloads
 
-    if not options.get('url'):
-        raise Exception("URL no especificada")
-    
-    # 1. Determinar el nombre del archivo
-    filename = options.get('filename')
-    if not filename:
-        m = NAME_PATTERN.search(options['url'])
-        if m:
-            # Replicar la lógica de nombramiento de downloads.js
-            filename = m.group(1) + (m.group(2) if m.group(2) else '')
-        else:
-            filename = "file"
-            
-    file_path = os.path.join(options.get('directory') or download_folder, filename)
-    
-    # 2. Configurar la descarga
     dl_id = current_download_id + 1
     current_download_id = dl_id
-    
-    dl_options = {
-        'headers': get_got_headers(options.get('headers', [])),
-        'stream': True, # Para descarga en streaming
-        'verify': options.get('rejectUnauthorized', True), # Certificado SSL
-        # Opciones de proxy no implementadas aquí por simplicidad de dependencias,
-        # pero usarían el parámetro `proxies` en requests si se configura.
-    }
-    
+
     downloads[dl_id] = {
         'url': options['url'],
+        'host': urlsplit(options['url']).netloc.lower(),
         'filename': file_path,
-        'state': "in_progress",
+        'state': "queued",
         'error': None,
         'totalBytes': 0,
         'bytesReceived': 0,
         'thread': None,
-        'file_stream': None
+        'file_stream': None,
+        'options': options,
+        'lock': threading.Lock(),
+        'limiter': throttle.TokenBucket(throttle.parse_rate(options.get('rateLimit'))),
+        # Estado del journal de reanudación
+        'etag': None,
+        'lastModified': None,
+        'done': [],
+        'segments': [],
+        'journalSaved': 0,
+        'run': lambda: download_thread(dl_id, transfer),
+        **fields
     }
-    
-    def remove_entry(entry):
-        """Elimina la entrada después de un tiempo (60s)"""
-        time.sleep(60)
-        downloads.pop(dl_id, None)
-
-    def failed_download(entry, err):
-        """Marca la descarga como interrumpida"""
-        if entry.get('state') != "complete":
-            entry['state'] = "interrupted"
-            entry['error'] = str(err)
-            if entry['file_stream']:
-                entry['file_stream'].close()
-            threading.Thread(target=remove_entry, args=(entry,)).start()
-
-    def download_thread(dl_id, options):
-        """Lógica real de descarga que se ejecuta en un hilo."""
-        entry = downloads[dl_id]
-        
-        # 1. Crear el directorio si no existe
-        try:
-            os.makedirs(os.path.dirname(entry['filename']), exist_ok=True)
-        except Exception as e:
-            failed_download(entry, e)
-            return
 
-        # 2. Iniciar la solicitud
-        try:
-            with requests.get(entry['url'], **dl_options) as r:
-                r.raise_for_status()
-                
-                # Obtener Content-Length y configurar la descarga
-                content_length = r.headers.get('content-length')
-                if content_length:
-                    entry['totalBytes'] = int(content_length)
-
-                # 3. Escribir al archivo
-                with open(entry['filename'], 'wb') as f:
-                    entry['file_stream'] = f
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if entry['state'] == "interrupted": # Chequeo de cancelación
-                            break
-                        if chunk:
-                            f.write(chunk)
-                            entry['bytesReceived'] += len(chunk)
-
-            # 4. Finalizar
-            if entry['state'] != "interrupted":
-                entry['state'] = "complete"
-                # Lógica ECONNRESET de downloads.js no implementada, pero se puede añadir
-                # si se detecta un error de conexión después de que se ha descargado todo.
-                threading.Thread(target=remove_entry, args=(entry,)).start()
-            
-            entry['file_stream'] = None # Liberar referencia
-
-        except Exception as e:
-            failed_download(entry, e)
+    enqueue_download(dl_id, int(options.get('priority') or 0))
+    return dl_id
+
+def rpc_download(options):
+    """
+    Encola una descarga HTTP asíncrona; el planificador la arranca en un hilo
+    separado en cuanto hay hueco. Reemplaza downloads.download en downloads.js
+
+    Opciones adicionales:
+        segments (int): número de conexiones paralelas (1 usa una sola conexión;
+            como mucho MAX_SEGMENTS).
+        resume (bool): reanudar desde el journal si existe uno válido.
+        priority (int): prioridad en la cola (mayor se atiende antes, 0 por defecto).
+        rateLimit (int|str): límite de bytes/segundo de esta descarga (ej. 500000 o "2M").
+    """
+    if not options.get('url'):
+        raise Exception("URL no especificada")
     
-    # 3. Iniciar el hilo de descarga
-    t = threading.Thread(target=download_thread, args=(dl_id, options))
-    t.start()
-    downloads[dl_id]['thread'] = t
+    # 1. Determinar el nombre del archivo
+    filename = options.get('filename') or default_filename(options['url'])
+    file_path = os.path.join(options.get('directory') or download_folder, filename)
+    
+    # 2. Configurar la descarga
+    dl_options = {
+        **transfer_options(options),
+        'stream': True, # Para descarga en streaming
+    }
+    segments = clamp_segments(options.get('segments'))
+    resume = bool(options.get('resume'))
+    
+    # 3. Encolar la descarga en el planificador
+    return add_download(options, file_path,
+                        lambda entry: http_transfer(entry, dl_options, segments, resume))
 
-    return dl_id
+def rpc_resume(options):
+    """
+    Reanuda una descarga interrumpida a partir de su journal.
+    Acepta el ID de una descarga conocida ({"id": ...}) o las mismas
+    opciones que downloads.download. Si no hay journal válido, descarga desde cero.
+    """
+    if options.get('id') is not None:
+        entry = downloads.get(options['id'])
+        if not entry:
+            raise Exception(f"Descarga {options['id']} desconocida")
+        if entry['state'] in ("queued", "in_progress"):
+            raise Exception(f"La descarga {options['id']} sigue en curso")
+        downloads.pop(options['id'], None)
+        options = entry['options']
+
+    return rpc_download({**options, 'resume': True})
 
 
+def download_status(entry):
+    """Estado público de una descarga (formato de downloads.search en downloads.js)."""
+    return {
+        "totalBytes": entry['totalBytes'],
+        "bytesReceived": entry['bytesReceived'],
+        "url": entry['url'],
+        "filename": entry['filename'],
+        "state": entry['state'],
+        "error": entry['error'],
+        # Solo en descargas por segmentos HLS/DASH
+        **({"segmentsTotal": entry['segmentsTotal'], "segmentsDone": entry['segmentsDone']}
+           if 'segmentsTotal' in entry else {})
+    }
+
 def rpc_search(query):
     """
     Busca el estado de una descarga específica por ID.
@@ -160,24 +582,80 @@ def rpc_search(query):
     
     if entry:
         # Replicar el formato de respuesta de downloads.js
-        return [{
-            "totalBytes": entry['totalBytes'],
-            "bytesReceived": entry['bytesReceived'],
-            "url": entry['url'],
-            "filename": entry['filename'],
-            "state": entry['state'],
-            "error": entry['error']
-        }]
+        return [download_status(entry)]
     else:
         return []
 
+def watch(query):
+    """
+    Versión síncrona de downloads.watch (para el CLI): produce el estado de la descarga
+    en cada cambio y devuelve el estado final al completarse o interrumpirse.
+    """
+    dl_id = query.get('id')
+    interval = float(query.get('interval') or WATCH_INTERVAL)
+    last = None
+    while True:
+        entry = downloads.get(dl_id)
+        if not entry:
+            return last
+        status = download_status(entry)
+        if status != last:
+            yield status
+            last = status
+        if status['state'] in ("complete", "interrupted"):
+            return status
+        if rpc.is_cancelled():
+            return last # El observador se canceló; la descarga sigue
+        with progress:
+            progress.wait(interval)
+
+async def rpc_watch(query):
+    """
+    Sigue una descarga en streaming en lugar de consultar downloads.search.
+    Produce su estado cada vez que cambia (el avance, como mucho cada 'interval'
+    segundos); el último valor es el estado final al completarse o interrumpirse.
+    Espera en el bucle asyncio, así que los observadores no consumen hilos del pool.
+    """
+    dl_id = query.get('id')
+    interval = float(query.get('interval') or WATCH_INTERVAL)
+    changed = asyncio.Event()
+    watcher = (asyncio.get_running_loop(), changed)
+    with progress:
+        watchers.add(watcher)
+    try:
+        last = None
+        while True:
+            changed.clear()
+            entry = downloads.get(dl_id)
+            if not entry:
+                return
+            status = download_status(entry)
+            if status != last:
+                yield status
+                last = status
+            if status['state'] in ("complete", "interrupted"):
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with progress:
+            watchers.discard(watcher)
+
 def rpc_cancel(dl_id):
     """
     Cancela una descarga en curso.
     Reemplaza downloads.cancel en downloads.js
     """
     entry = downloads.get(dl_id)
-    if entry and entry['state'] == "in_progress":
+    if entry and entry['state'] == "queued":
+        # Aún no ha arrancado: el planificador la descartará al desencolarla
+        entry['state'] = "interrupted"
+        entry['error'] = "Aborted"
+        notify_progress()
+        threading.Thread(target=remove_entry, args=(dl_id,)).start()
+    elif entry and entry['state'] == "in_progress":
         entry['state'] = "interrupted"
         entry['error'] = "Aborted"
         
@@ -187,9 +665,42 @@ def rpc_cancel(dl_id):
         
         # La limpieza se maneja en el hilo de descarga para asegurar el cierre.
 
+def rpc_set_concurrency(options):
+    """
+    Ajusta los límites del planificador: {max, perHost}.
+    Las descargas en cola arrancan de inmediato si los nuevos límites lo permiten.
+    """
+    global MAX_CONCURRENT_DOWNLOADS, MAX_PER_HOST
+    if options.get('max'):
+        MAX_CONCURRENT_DOWNLOADS = max(1, int(options['max']))
+    if options.get('perHost'):
+        MAX_PER_HOST = max(1, int(options['perHost']))
+    schedule_pending()
+    return {"max": MAX_CONCURRENT_DOWNLOADS, "perHost": MAX_PER_HOST}
+
+def rpc_set_rate(options):
+    """
+    Ajusta en caliente el límite de ancho de banda: {id, rate}.
+    Sin 'id' se cambia el límite global; rate vacío o 0 elimina el límite.
+    """
+    rate = throttle.parse_rate(options.get('rate'))
+    if options.get('id') is None:
+        throttle.global_bucket.set_rate(rate)
+        return True
+
+    entry = downloads.get(options['id'])
+    if not entry:
+        raise Exception(f"Descarga {options['id']} desconocida")
+    entry['limiter'].set_rate(rate)
+    return True
+
 # Registrar los métodos RPC
 rpc.listen({
     "downloads.download": rpc_download,
     "downloads.search": rpc_search,
-    "downloads.cancel": rpc_cancel
+    "downloads.watch": rpc_watch,
+    "downloads.cancel": rpc_cancel,
+    "downloads.resume": rpc_resume,
+    "downloads.setConcurrency": rpc_set_concurrency,
+    "downloads.setRate": rpc_set_rate
 })
\ No newline at end of file
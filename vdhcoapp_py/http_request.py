@@ -3,7 +3,6 @@
 import sys
 import threading
 import time
-import requests
 import json
 import base64
 from collections import deque
@@ -11,6 +10,7 @@ from io import BytesIO
 
 from . import rpc
 from . import logger
+from . import transport
 
 # Constantes definidas en request.js
 MAX_SIZE = 50000
@@ -163,7 +163,7 @@ def rpc_request(url, options={}):
     }
     
     try:
-        r = requests.request(method, url, **req_options)
+        r = transport.request(method, url, **req_options)
         r.raise_for_status()
 
         # Almacenar como texto para su fragmentación
@@ -219,7 +219,7 @@ def rpc_request_binary(url, options={}):
     def streaming_thread(url, req_options):
         """Hilo para la descarga binaria en streaming."""
         try:
-            with requests.get(url, **req_options) as r:
+            with transport.get(url, **req_options) as r:
                 r.raise_for_status()
                 for chunk in r.iter_content(chunk_size=MAX_SIZE):
                     if chunk:
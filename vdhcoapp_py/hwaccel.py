@@ -0,0 +1,132 @@
+# vdhcoapp_py/hwaccel.py
+
+# Selección de codificación por hardware para converter.convert (opción autoAccelerate).
+# Con las capacidades de ffmpeg (registro de capabilities: -hwaccels y -encoders,
+# sondeados una sola vez) se elige el primer backend disponible que tenga codificador
+# para el códec de vídeo pedido y se reescriben los argumentos: codificador por hardware,
+# decodificación por hardware antes de la entrada y calidad equivalente a -crf.
+# Si el proceso acelerado falla al arrancar, el conversor repite la conversión con los
+# argumentos originales y el codificador queda descartado durante el resto de la sesión.
+
+import threading
+
+# Backends por orden de preferencia. 'encoder_suffix': los codificadores se llaman
+# <familia>_<sufijo> (h264_nvenc, hevc_qsv...); 'hwaccel': método de -hwaccel para
+# decodificar; 'quality': opción equivalente a -crf (None: se usa la del codificador);
+# 'hw_frames': el codificador solo acepta fotogramas en memoria de la GPU.
+BACKENDS = [
+    {"name": "nvenc", "encoder_suffix": "nvenc", "hwaccel": "cuda", "quality": "-cq", "hw_frames": False},
+    {"name": "qsv", "encoder_suffix": "qsv", "hwaccel": "qsv", "quality": "-global_quality", "hw_frames": False},
+    {"name": "vaapi", "encoder_suffix": "vaapi", "hwaccel": "vaapi", "quality": "-qp", "hw_frames": True},
+    {"name": "videotoolbox", "encoder_suffix": "videotoolbox", "hwaccel": "videotoolbox", "quality": None, "hw_frames": False},
+    {"name": "amf", "encoder_suffix": "amf", "hwaccel": "d3d11va", "quality": None, "hw_frames": False}
+]
+
+# Familia de cada códec de vídeo que puede aparecer en los argumentos
+VIDEO_CODECS = {
+    "h264": "h264", "libx264": "h264", "libopenh264": "h264",
+    "hevc": "hevc", "h265": "hevc", "libx265": "hevc",
+    "av1": "av1", "libaom-av1": "av1", "libsvtav1": "av1", "librav1e": "av1",
+    "vp9": "vp9", "libvpx-vp9": "vp9",
+    "mpeg2video": "mpeg2"
+}
+
+VIDEO_CODEC_OPTIONS = ("-c:v", "-codec:v", "-vcodec")
+# Opciones propias de los codificadores por software que los de hardware rechazan
+SOFTWARE_OPTIONS = ("-preset", "-tune", "-x264-params", "-x264opts", "-x265-params",
+                    "-aom-params", "-svtav1-params")
+FILTER_OPTIONS = ("-vf", "-filter", "-filter_complex", "-lavfi")
+
+failed_encoders = set() # Codificadores que ya fallaron al arrancar en esta sesión
+failed_lock = threading.Lock()
+
+def option_name(arg):
+    """Nombre de una opción sin el especificador de flujo (-crf:v:0 -> -crf)."""
+    return arg.split(":", 1)[0]
+
+def codec_positions(args):
+    """Índices de los valores de -c:v/-vcodec cuyo códec tiene familia conocida."""
+    return [i + 1 for i, arg in enumerate(args[:-1])
+            if arg in VIDEO_CODEC_OPTIONS and args[i + 1] in VIDEO_CODECS]
+
+def available(capabilities):
+    """Backends utilizables según las capacidades: [{backend, hwaccel, encoders}]."""
+    encoders = capabilities.get('encoders') or {}
+    hwaccels = capabilities.get('hwaccels') or []
+    result = []
+    for backend in BACKENDS:
+        names = sorted(name for name in encoders if name.endswith("_" + backend['encoder_suffix']))
+        if names:
+            result.append({"backend": backend['name'],
+                           "hwaccel": backend['hwaccel'] if backend['hwaccel'] in hwaccels else None,
+                           "encoders": names})
+    return result
+
+def select(capabilities, families, filtered=False):
+    """Primer backend con codificador para todas las familias pedidas, o None."""
+    encoders = capabilities.get('encoders') or {}
+    hwaccels = capabilities.get('hwaccels') or []
+    with failed_lock:
+        failed = set(failed_encoders)
+    for backend in BACKENDS:
+        names = {family: f"{family}_{backend['encoder_suffix']}" for family in families}
+        if any(name not in encoders or name in failed for name in names.values()):
+            continue
+        if backend['hw_frames'] and (filtered or backend['hwaccel'] not in hwaccels):
+            continue # Necesitaría subir los fotogramas a la GPU (hwupload)
+        return backend, names
+    return None
+
+def accelerate(args, capabilities):
+    """
+    Reescribe los argumentos de una conversión para codificar por hardware.
+    Devuelve {backend, encoders, hwaccel, args} o None si no hay vídeo que recodificar
+    o ningún backend disponible.
+    """
+    positions = codec_positions(args)
+    if not positions:
+        return None # Sin -c:v (o -c:v copy): nada que acelerar
+    families = {VIDEO_CODECS[args[i]] for i in positions}
+    filtered = any(option_name(arg) in FILTER_OPTIONS for arg in args)
+    selected = select(capabilities, families, filtered)
+    if not selected:
+        return None
+    backend, names = selected
+
+    new_args = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        name = option_name(arg)
+        if i in positions:
+            new_args.append(names[VIDEO_CODECS[arg]])
+        elif i + 1 < len(args) and name in SOFTWARE_OPTIONS:
+            i += 1 # Descartar la opción y su valor
+        elif i + 1 < len(args) and name == "-crf":
+            if backend['quality']:
+                new_args.extend([backend['quality'], args[i + 1]])
+            i += 1
+        else:
+            new_args.append(arg)
+        i += 1
+
+    hwaccel = backend['hwaccel'] if backend['hwaccel'] in (capabilities.get('hwaccels') or []) else None
+    if hwaccel and "-hwaccel" not in new_args and "-i" in new_args:
+        decode_args = ["-hwaccel", hwaccel]
+        if backend['hw_frames']:
+            decode_args += ["-hwaccel_output_format", hwaccel]
+        first_input = new_args.index("-i")
+        new_args[first_input:first_input] = decode_args
+
+    return {"backend": backend['name'], "encoders": sorted(set(names.values())),
+            "hwaccel": hwaccel, "args": new_args}
+
+def mark_failed(encoders):
+    """Descarta codificadores que fallaron al arrancar (no se vuelven a elegir)."""
+    with failed_lock:
+        failed_encoders.update(encoders)
+
+def has_failed(encoders):
+    """Indica si alguno de los codificadores ya falló al arrancar."""
+    with failed_lock:
+        return any(name in failed_encoders for name in encoders)
@@ -1,43 +1,110 @@
 # vdhcoapp_py/logger.py
 
 import os
+import sys
+import json
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-# Definir las funciones de log como no-op (no-operación) por defecto.
-info = lambda *a, **kw: None
-error = lambda *a, **kw: None
-warn = lambda *a, **kw: None
-log = lambda *a, **kw: None
+# Los registros se encolan con un QueueHandler y un QueueListener los escribe desde su
+# propio hilo, de modo que la E/S de stderr o del archivo de log nunca bloquea el
+# bucle de mensajes. Por defecto solo se emiten advertencias y errores.
+
+LOG_QUEUE_SIZE = 10000 # Registros pendientes como máximo; el excedente se descarta
+BODY_LIMIT = 512 # Caracteres máximos al mostrar el cuerpo de un mensaje
+ITEMS_LIMIT = 16 # Elementos máximos de una lista al mostrar un mensaje
+
+# Niveles de depuración de rpc.set_debug_level: 0=WARNING, 1=INFO, 2=DEBUG
+DEBUG_LEVELS = {0: logging.WARNING, 1: logging.INFO, 2: logging.DEBUG}
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta el registro si la cola está llena en lugar de bloquear."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+# 1. Crear un logger de Python
+logger = logging.getLogger('VdhCoAppLogger')
+logger.setLevel(logging.WARNING)
+logger.propagate = False
+
+# 2. Configurar el formato del log (opcionalmente simplificado)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+# 3. Manejadores reales: stderr siempre y, si está definido, el archivo de log
+stderr_handler = logging.StreamHandler(sys.stderr)
+stderr_handler.setFormatter(formatter)
+handlers = [stderr_handler]
 
 # Obtener la ruta del archivo de log desde la variable de entorno.
 log_file = os.environ.get("WEH_NATIVE_LOGFILE") # Similar a logfile en logger.js
 
 if log_file:
-    # Si la ruta está definida, configurar el logger real.
-    
-    # 1. Crear un logger de Python
-    logger = logging.getLogger('VdhCoAppLogger')
-    logger.setLevel(logging.INFO)
-
-    # 2. Configurar el formato del log (opcionalmente simplificado)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-    # 3. Crear un manejador que escriba en el archivo de log (RotatingFileHandler es común)
     # El archivo será gestionado con rotación para evitar que crezca indefinidamente.
     file_handler = RotatingFileHandler(
-        log_file, 
+        log_file,
         maxBytes=1024 * 1024 * 5, # 5MB
         backupCount=5
     )
     file_handler.setFormatter(formatter)
-    
-    # 4. Asignar el manejador al logger
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-
-    # 5. Sobrescribir las funciones no-op con los métodos reales del logger
-    info = logger.info
-    error = logger.error
-    warn = logger.warning
-    log = logger.info # Usamos info para el log general, como en simple-node-logger
\ No newline at end of file
+    handlers.append(file_handler)
+
+# 4. Asignar el manejador de cola al logger y arrancar el hilo que escribe
+log_queue = queue.Queue(LOG_QUEUE_SIZE)
+if not logger.handlers:
+    logger.addHandler(DroppingQueueHandler(log_queue))
+listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop) # Escribir los registros pendientes al salir
+
+# 5. Funciones de log (los argumentos se formatean solo si el nivel está activo)
+debug = logger.debug
+info = logger.info
+error = logger.error
+warn = logger.warning
+log = logger.info # Usamos info para el log general, como en simple-node-logger
+
+def set_level(level):
+    """Cambia el nivel de log (nombre como 'DEBUG' o constante de logging)."""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logger.setLevel(level)
+
+def is_enabled(level):
+    """Indica si un nivel se emitiría (para evitar trabajo costoso si no)."""
+    return logger.isEnabledFor(level)
+
+def summarize(value):
+    """Copia reducida de un mensaje: cadenas y listas largas se recortan."""
+    if isinstance(value, dict):
+        return {k: summarize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [summarize(v) for v in value[:ITEMS_LIMIT]]
+        if len(value) > ITEMS_LIMIT:
+            items.append(f"... ({len(value)} elementos)")
+        return items
+    if isinstance(value, str) and len(value) > BODY_LIMIT:
+        return f"{value[:BODY_LIMIT]}... ({len(value)} caracteres)"
+    return value
+
+class LazyMessage:
+    """Envuelve un mensaje RPC para formatearlo (resumido) solo si el registro se emite."""
+
+    __slots__ = ('message',)
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        try:
+            text = json.dumps(summarize(self.message), ensure_ascii=False, default=str)
+        except Exception:
+            text = repr(self.message)
+        if len(text) > BODY_LIMIT:
+            text = f"{text[:BODY_LIMIT]}... ({len(text)} caracteres)"
+        return text
@@ -7,27 +7,26 @@ import json
 import argparse
 import platform
 import asyncio
-import time 
+import importlib
+import threading
 import tomllib as toml 
-from dotenv import load_dotenv # Para cargar el archivo .env
 
-# Importaciones de módulos internos del paquete vdhcoapp_py
+# Importaciones de módulos internos del paquete vdhcoapp_py.
+# Solo lo imprescindible para atender mensajes; el resto (requests, ffmpeg, etc.) se
+# importa en el primer uso para que el arranque en frío de cada conexión sea rápido.
 from . import rpc
 from . import logger
-from . import autoinstall
-from . import converter
-from . import downloads 
-from . import file_ops 
-from . import request_ops 
-from . import vm
 from . import native_messaging 
+from . import converter # Ligero: sus dependencias pesadas (ffmpeg) se resuelven al usarlo
 
 # =================================================================
 # --- CARGA DE CONFIGURACIÓN Y .ENV ---
 # =================================================================
 
-# Cargar las variables de entorno desde un archivo .env
-load_dotenv() 
+def load_env():
+    """Carga las variables de entorno desde un archivo .env (python-dotenv se importa aquí)."""
+    from dotenv import load_dotenv
+    load_dotenv()
 
 CONFIG_FILENAME = 'config.toml'
 config = None 
@@ -47,6 +46,51 @@ except Exception as e:
     sys.exit(1)
 
 
+# =================================================================
+# --- CARGA DIFERIDA DE MÓDULOS ---
+# =================================================================
+
+def load_module(name):
+    """Importa un submódulo del paquete (registra sus métodos RPC al importarse)."""
+    return importlib.import_module(f".{name}", __package__)
+
+def load_converter():
+    """Registra los métodos RPC del conversor (una sola vez)."""
+    if "converter.convert" not in rpc.handler_map:
+        converter.start_listening()
+    return converter
+
+def warm_up_capabilities():
+    """
+    Sondea las capacidades de ffmpeg en segundo plano nada más arrancar, sin esperar
+    a que se registre el conversor: la primera llamada converter.*/info ya las encuentra.
+    """
+    try:
+        load_module("capabilities").start(converter.find_binary("ffmpeg"))
+    except Exception as e:
+        logger.warn(f"No se pudo iniciar el sondeo de capacidades de ffmpeg: {e}")
+
+# Cargador por prefijo de método (o nombre exacto) para rpc.listen_lazy
+LAZY_MODULES = {
+    "downloads.": lambda: load_module("downloads"),
+    "downloads.downloadHls": lambda: load_module("streams"),
+    "downloads.downloadDash": lambda: load_module("streams"),
+    "converter.": load_converter,
+    "probeCache.": lambda: load_module("probe_cache"),
+    "transport.": lambda: load_module("transport"),
+    "request": lambda: load_module("request_ops"),
+    "requestExtra": lambda: load_module("request_ops"),
+    "requestBinary": lambda: load_module("request_ops"),
+    "listFiles": lambda: load_module("file_ops"),
+    "path.": lambda: load_module("file_ops"),
+    "getParents": lambda: load_module("file_ops"),
+    "makeUniqueFileName": lambda: load_module("file_ops"),
+    "tmp.": lambda: load_module("file_ops"),
+    "fs.": lambda: load_module("file_ops"),
+    "vm.": lambda: load_module("vm"),
+    "autoinstall.": lambda: load_module("autoinstall"),
+}
+
 # =================================================================
 # --- FUNCIÓN INFO (ASÍNCRONA) ---
 # =================================================================
@@ -70,6 +114,8 @@ async def get_info():
     
     try:
         # Llama al conversor de forma asíncrona para obtener su información
+        # El primer registro del conversor no debe bloquear el bucle
+        await asyncio.to_thread(load_converter)
         conv_info = await converter.info()
         result.update({
             "converterBinary": conv_info.get("converterBinary"),
@@ -85,10 +131,13 @@ async def get_info():
 # --- FUNCIÓN DE DESCARGA AUTÓNOMA (NUEVO CLI) ---
 # =================================================================
 
-def autonomous_download(url, output_dir):
+def autonomous_download(url, output_dir, resume=False, limit_rate=None, stream_format=None):
     """
     Inicia y monitorea una descarga de video de forma síncrona
     utilizando variables de entorno para la autenticación (Cookie y User-Agent).
+    Con resume=True continúa desde el journal de una descarga interrumpida;
+    limit_rate (ej. "500K", "2M") limita los bytes/segundo de la descarga y
+    stream_format ("hls" o "dash") descarga los segmentos de un manifiesto.
     """
     
     # 1. Obtener las claves de autenticación de os.environ
@@ -109,39 +158,44 @@ def autonomous_download(url, output_dir):
             "headers": [
                 {"name": "Cookie", "value": cookie_value},
                 {"name": "User-Agent", "value": user_agent_value} 
-            ]
+            ],
+            "rateLimit": limit_rate
         }
         
-        # 3. Iniciar la descarga
-        download_id = downloads.rpc_download(options)
+        # 3. Iniciar (o reanudar) la descarga
+        from . import downloads
+        from . import streams
+        if stream_format == "hls":
+            download_id = streams.rpc_download_hls(options)
+        elif stream_format == "dash":
+            download_id = streams.rpc_download_dash(options)
+        elif resume:
+            download_id = downloads.rpc_resume(options)
+        else:
+            download_id = downloads.rpc_download(options)
 
         print(f"✅ Descarga iniciada (ID: {download_id}). Directorio: {options['directory']}")
         
-        # 4. Bucle de monitoreo
-        while True:
-            results = downloads.rpc_search({"id": download_id})
+        # 4. Monitoreo: downloads.watch produce el estado en cada cambio (sin sondeo)
+        for entry in downloads.watch({"id": download_id}):
+            state = entry['state']
             
-            if results:
-                entry = results[0]
-                state = entry['state']
-                
-                total_bytes = entry.get('totalBytes', 0)
-                received_bytes = entry.get('bytesReceived', 0)
-                
-                progress = (received_bytes / total_bytes) * 100 if total_bytes > 0 else 0
-                
-                # Mostrar el progreso en la misma línea
-                print(f"Estado: {state} | Progreso: {progress:.2f}% | Recibido: {received_bytes:,} bytes", end='\r')
-                
-                if state == "complete":
-                    print(f"\n🎉 ¡Descarga completa! Archivo guardado como: {entry['filename']}")
-                    break
-                elif state == "interrupted":
-                    print(f"\n❌ Error en la descarga: {entry.get('error', 'Descarga interrumpida')}")
-                    break
+            total_bytes = entry.get('totalBytes', 0)
+            received_bytes = entry.get('bytesReceived', 0)
             
-            # Pausa de 1 segundo para evitar saturar el sistema
-            time.sleep(1) 
+            progress = (received_bytes / total_bytes) * 100 if total_bytes > 0 else 0
+            
+            # Mostrar el progreso en la misma línea
+            if 'segmentsTotal' in entry and entry['segmentsTotal']:
+                # Streams HLS/DASH: el tamaño total se desconoce, se cuenta por segmentos
+                progress = (entry['segmentsDone'] / entry['segmentsTotal']) * 100
+            
+            print(f"Estado: {state} | Progreso: {progress:.2f}% | Recibido: {received_bytes:,} bytes", end='\r')
+            
+            if state == "complete":
+                print(f"\n🎉 ¡Descarga completa! Archivo guardado como: {entry['filename']}")
+            elif state == "interrupted":
+                print(f"\n❌ Error en la descarga: {entry.get('error', 'Descarga interrumpida')}")
             
     except Exception as e:
         # Manejo de errores durante el proceso de descarga
@@ -166,6 +220,11 @@ def main():
     download_parser = subparsers.add_parser('download', help='Inicia una descarga de video autónoma.')
     download_parser.add_argument('url', help='URL del video a descargar.')
     download_parser.add_argument('output_dir', help='Directorio de destino para el archivo.')
+    download_parser.add_argument('--resume', action='store_true', help='Reanuda una descarga interrumpida desde su journal.')
+    download_parser.add_argument('--limit-rate', metavar='TASA', help='Limita la velocidad de descarga (ej. 500K, 2M).')
+    stream_group = download_parser.add_mutually_exclusive_group()
+    stream_group.add_argument('--hls', dest='stream_format', action='store_const', const='hls', help='La URL es un manifiesto HLS (m3u8).')
+    stream_group.add_argument('--dash', dest='stream_format', action='store_const', const='dash', help='La URL es un manifiesto DASH (mpd).')
     
     # Subcomando: install
     install_parser = subparsers.add_parser('install', help='Registra la aplicación con los navegadores.')
@@ -193,15 +252,19 @@ def main():
     # --- Lógica de Manejo de Comandos ---
     
     if args.command == 'download':
-        autonomous_download(args.url, args.output_dir)
+        load_env()
+        autonomous_download(args.url, args.output_dir, resume=args.resume,
+                            limit_rate=args.limit_rate, stream_format=args.stream_format)
         return
         
     elif args.command == 'install':
+        from . import autoinstall
         install_args = sys.argv[2:] 
         autoinstall.install(install_args)
         return
         
     elif args.command == 'uninstall':
+        from . import autoinstall
         uninstall_args = sys.argv[2:]
         autoinstall.uninstall(uninstall_args)
         return
@@ -222,8 +285,17 @@ def main():
     
     try:
         rpc.set_logger(logger)
-        rpc.set_debug_level(2)
-        converter.start_listening()
+        # WEH_NATIVE_DEBUG: 0=advertencias (por defecto), 1=info, 2=cuerpos de mensajes
+        rpc.set_debug_level(int(os.environ.get("WEH_NATIVE_DEBUG", 0)))
+        load_env()
+        # Sección [rpc] opcional de config.toml: [rpc.lanes.<carril>] workers/queue
+        # y [rpc.method_lanes] método = "carril" (también en caliente: rpc.configurePool)
+        pool_config = config.get("rpc") or {}
+        rpc.configure_pool(pool_config.get("lanes"), pool_config.get("method_lanes"))
+        rpc.listen_lazy(LAZY_MODULES)
+        # En el hilo principal: signal.signal() falla desde cualquier otro hilo
+        converter.install_signal_handlers()
+        threading.Thread(target=warm_up_capabilities, name="capabilities-warmup", daemon=True).start()
         
         rpc.listen({
             "quit": lambda: sys.exit(0),
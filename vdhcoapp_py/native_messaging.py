@@ -3,35 +3,264 @@
 import sys
 import json
 import struct # Para manejar los 4 bytes little-endian de longitud
+import asyncio
+import os
+import queue
 import threading
+from collections import deque
+from collections.abc import Mapping
 from . import rpc # Importamos nuestro módulo RPC
+from . import logger
 
-logger = sys.stderr # Usado antes de cargar el logger real
+# Límite de tamaño de un mensaje de la aplicación al navegador (1 MB)
+MAX_MESSAGE_SIZE = 1024 * 1024
+BATCH_PREFIX = b'{"type":"weh#rpc-batch","messages":['
+BATCH_SUFFIX = b']}'
 
-def send_message(message):
+# --- CODEC JSON ---
+# Los mensajes se serializan directamente a bytes y se decodifican desde bytes, sin
+# pasar por un str intermedio. Se usa orjson o msgspec si están instalados y la
+# librería estándar en caso contrario; VDH_JSON_CODEC permite forzar uno.
+
+def json_default(obj):
+    """Convierte los tipos que los codecs no serializan por sí solos (p. ej. os.environ)."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return list(bytes(obj))
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+def stdlib_codec():
+    """Codec de la librería estándar (siempre disponible)."""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=json_default)
+    return (lambda message: encoder.encode(message).encode('utf-8')), json.loads
+
+def orjson_codec():
+    """Codec basado en orjson."""
+    import orjson
+    # OPT_NON_STR_KEYS: claves no str (p. ej. int) como las acepta json.dumps
+    return (lambda message: orjson.dumps(message, default=json_default, option=orjson.OPT_NON_STR_KEYS)), orjson.loads
+
+def msgspec_codec():
+    """Codec basado en msgspec."""
+    import msgspec
+    # msgspec serializa bytes como base64 sin pasar por enc_hook; ningún manejador
+    # envía bytes sin convertir (request_ops y file_ops ya mandan list(data)).
+    encoder = msgspec.json.Encoder(enc_hook=json_default)
+    return encoder.encode, msgspec.json.decode
+
+CODECS = {
+    "orjson": orjson_codec,
+    "msgspec": msgspec_codec,
+    "json": stdlib_codec
+}
+
+codec_name = None
+encode = None # message -> bytes
+decode = None # bytes -> message
+
+def set_codec(name=None):
     """
-    Envía un objeto JSON al navegador usando el protocolo de Native Messaging.
-    (4 bytes little-endian para la longitud + contenido JSON UTF-8)
+    Selecciona el codec JSON. Sin nombre se prueba orjson, msgspec y json, en ese orden.
+    Devuelve el nombre del codec activo.
     """
+    global codec_name, encode, decode
+    candidates = [name] if name else list(CODECS)
+    for candidate in candidates:
+        if candidate not in CODECS:
+            raise Exception(f"Codec JSON desconocido: {candidate}")
+        try:
+            encode, decode = CODECS[candidate]()
+        except ImportError:
+            continue
+        codec_name = candidate
+        return codec_name
+    raise Exception(f"Codec JSON no disponible: {name}")
+
+set_codec(os.environ.get('VDH_JSON_CODEC'))
+
+def encode_message(message):
+    """Serializa un mensaje a bytes JSON UTF-8."""
+    return encode(message)
+
+# --- HILO ESCRITOR ---
+# Un único hilo escribe en stdout. Los productores (bucle RPC, hilos de trabajo) solo
+# encolan frames ya serializados; la cola acotada les aplica contrapresión si el
+# navegador no consume. El bucle asyncio nunca se bloquea en ella: si está llena, sus
+# frames esperan en 'overflow' (en orden) y una tarea los pasa a la cola desde un hilo
+# auxiliar, de modo que la lectura de stdin y las cancelaciones siguen atendiéndose.
+# Cada tanda de frames pendientes se escribe con una sola
+# llamada vectorizada (os.writev) sin concatenar, y stdout se vacía una vez por tanda.
+WRITE_QUEUE_SIZE = 256 # Frames pendientes como máximo antes de bloquear a los hilos productores
+WRITE_GATHER_MAX = 64 # Frames agrupados como máximo en una sola escritura
+
+write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+writer_thread = None
+writer_lock = threading.Lock()
+overflow = deque() # Frames del bucle asyncio a la espera de hueco en write_queue
+overflow_task = None
+
+def stdout_fd():
+    """Descriptor de stdout si admite escritura vectorizada; None en caso contrario."""
+    if not hasattr(os, 'writev'):
+        return None
     try:
-        # Serializar el objeto a una cadena JSON UTF-8
-        msg_str = json.dumps(message, ensure_ascii=False)
-        msg_bytes = msg_str.encode('utf-8')
-        
-        # Calcular la longitud de los datos
-        msg_length = len(msg_bytes)
-        
+        return sys.stdout.buffer.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def writev_all(fd, buffers):
+    """Escribe todos los búferes con os.writev, continuando tras escrituras parciales."""
+    views = [memoryview(b) for b in buffers]
+    while views:
+        written = os.writev(fd, views)
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views and written:
+            views[0] = views[0][written:]
+
+def write_frames(fd, frames):
+    """Escribe una tanda de frames (prefijo de longitud + cuerpo) y vacía stdout."""
+    buffers = []
+    for msg_bytes in frames:
         # Empaquetar la longitud en 4 bytes little-endian (UInt32LE en Node.js)
         # El formato '<I' significa: '<' little-endian, 'I' unsigned integer (4 bytes)
-        length_bytes = struct.pack('<I', msg_length)
+        buffers.append(struct.pack('<I', len(msg_bytes)))
+        buffers.append(msg_bytes)
+    if fd is not None:
+        writev_all(fd, buffers)
+    else:
+        out = sys.stdout.buffer
+        for buffer in buffers:
+            out.write(buffer)
+        out.flush() # Un solo flush por tanda
+
+def writer():
+    """Bucle del hilo escritor: agrupa los frames encolados hasta recibir None."""
+    # Vaciar lo que hubiera quedado en el búfer de Python antes de escribir en el descriptor
+    sys.stdout.flush()
+    fd = stdout_fd()
+    running = True
+    while running:
+        frames = [write_queue.get()]
+        while len(frames) < WRITE_GATHER_MAX:
+            try:
+                frames.append(write_queue.get_nowait())
+            except queue.Empty:
+                break
+        if None in frames:
+            running = False
+            frames = frames[:frames.index(None)]
+        try:
+            if frames:
+                write_frames(fd, frames)
+        except Exception as e:
+            logger.error(f"Error al escribir en stdout: {e}")
+        finally:
+            for _ in range(len(frames) + (0 if running else 1)):
+                write_queue.task_done()
+
+def start_writer():
+    """Arranca el hilo escritor si aún no está en marcha."""
+    global writer_thread
+    with writer_lock:
+        if writer_thread is None or not writer_thread.is_alive():
+            writer_thread = threading.Thread(target=writer, name="nm-writer", daemon=True)
+            writer_thread.start()
 
-        # Escribir la longitud y luego el mensaje al stdout (binario)
-        sys.stdout.buffer.write(length_bytes)
-        sys.stdout.buffer.write(msg_bytes)
-        sys.stdout.buffer.flush() # Asegurar el envío inmediato
+def stop_writer(timeout=5.0):
+    """Escribe los frames pendientes y detiene el hilo escritor."""
+    global writer_thread
+    with writer_lock:
+        thread, writer_thread = writer_thread, None
+    if thread and thread.is_alive():
+        while overflow: # El bucle ya terminó: encolar lo que quedara pendiente
+            write_queue.put(overflow.popleft())
+        write_queue.put(None)
+        thread.join(timeout)
+
+async def drain_overflow():
+    """Pasa los frames de 'overflow' a write_queue sin bloquear el bucle."""
+    global overflow_task
+    loop = asyncio.get_running_loop()
+    try:
+        while overflow:
+            # Mientras la tarea exista, los frames nuevos van detrás en 'overflow'
+            await loop.run_in_executor(None, write_queue.put, overflow.popleft())
+    finally:
+        overflow_task = None
+
+def write_frame(msg_bytes):
+    """
+    Encola un frame de Native Messaging para el hilo escritor.
+    (4 bytes little-endian para la longitud + contenido JSON UTF-8)
+    Si la cola está llena, un hilo productor espera a que el escritor avance; en el
+    hilo del bucle asyncio el frame se aparta en 'overflow' y se encola después.
+    """
+    global overflow_task
+    if writer_thread is None:
+        start_writer()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        write_queue.put(msg_bytes)
+        return
+    if overflow_task is None:
+        try:
+            write_queue.put_nowait(msg_bytes)
+            return
+        except queue.Full:
+            pass
+    overflow.append(msg_bytes)
+    if overflow_task is None:
+        overflow_task = loop.create_task(drain_overflow())
 
+def send_message(message):
+    """Envía un objeto JSON al navegador usando el protocolo de Native Messaging."""
+    try:
+        logger.debug("Mensaje RPC enviado: %s", logger.LazyMessage(message))
+        write_frame(encode_message(message))
+    except Exception as e:
+        logger.error(f"Error al enviar mensaje: {e}")
+
+def send_batch(messages):
+    """
+    Envía varios mensajes RPC en frames 'weh#rpc-batch', sin superar MAX_MESSAGE_SIZE.
+    Cada mensaje se serializa una sola vez; un mensaje que no cabe junto a otros
+    (o que queda solo) se envía en su propio frame sin sobre.
+    """
+    try:
+        envelope_size = len(BATCH_PREFIX) + len(BATCH_SUFFIX)
+        group = []
+        group_size = envelope_size
+
+        def flush():
+            if len(group) == 1:
+                write_frame(group[0])
+            elif group:
+                write_frame(BATCH_PREFIX + b",".join(group) + BATCH_SUFFIX)
+
+        for message in messages:
+            msg_bytes = encode_message(message)
+            if group and group_size + len(msg_bytes) + 1 > MAX_MESSAGE_SIZE:
+                flush()
+                group = []
+                group_size = envelope_size
+            group.append(msg_bytes)
+            group_size += len(msg_bytes) + 1
+        flush()
     except Exception as e:
-        logger.write(f"ERROR al enviar mensaje: {e}\n")
+        logger.error(f"Error al enviar lote de mensajes: {e}")
+
+def decode_message(msg_bytes):
+    """Decodifica el cuerpo de un mensaje (JSON UTF-8) directamente desde bytes."""
+    message = decode(msg_bytes)
+    # El cuerpo solo se formatea (resumido) si el nivel DEBUG está activo
+    logger.debug("Mensaje RPC recibido: %s", logger.LazyMessage(message))
+    return message
 
 def read_message():
     """
@@ -54,38 +283,78 @@ def read_message():
         # Leer el mensaje JSON completo
         msg_bytes = sys.stdin.buffer.read(msg_length)
         if len(msg_bytes) != msg_length:
-            logger.write("ERROR: Lectura incompleta del mensaje.\n")
+            logger.error("Lectura incompleta del mensaje.")
             return None
         
-        # Decodificar el mensaje a una cadena UTF-8 y luego a un objeto JSON
-        msg_str = msg_bytes.decode('utf-8')
-        logger.write(f"DEBUG: Mensaje RPC recibido: {msg_str}\n")
-        msg_object = json.loads(msg_str)
-        
-        return msg_object
+        return decode_message(msg_bytes)
+
+    except Exception as e:
+        logger.error(f"Error al leer mensaje: {e}")
+        return None
 
+async def open_stdin_reader():
+    """
+    Conecta stdin al bucle asyncio como StreamReader.
+    Devuelve None si stdin no es un pipe compatible (p. ej. Windows o un archivo
+    redirigido); en ese caso se lee con read_message() en un hilo auxiliar.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+    except (NotImplementedError, ValueError, OSError):
+        return None
+    return reader
+
+async def read_message_async(reader):
+    """Versión asíncrona de read_message() sobre un StreamReader."""
+    if reader is None:
+        return await asyncio.get_running_loop().run_in_executor(None, read_message)
+    try:
+        length_bytes = await reader.readexactly(4)
+        msg_length = struct.unpack('<I', length_bytes)[0]
+        if msg_length == 0:
+            return None
+        return decode_message(await reader.readexactly(msg_length))
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            logger.error("Lectura incompleta del mensaje.")
+        return None
     except Exception as e:
-        logger.write(f"ERROR al leer mensaje: {e}\n")
+        logger.error(f"Error al leer mensaje: {e}")
         return None
 
-def start_messaging_loop():
+async def messaging_loop():
     """Bucle principal de lectura que simula el listener de stdin en native-messaging.js."""
-    global logger
-    logger.write("=================== iniciado ====================\n") # Simula log de native-messaging.js
+    logger.info("=================== iniciado ====================") # Simula log de native-messaging.js
 
-    # Configurar la función de post para el RPC, usando nuestra función de envío.
+    # Configurar la función de post y el bucle para el RPC.
     rpc.set_post(send_message)
+    rpc.set_post_batch(send_batch)
+    rpc.set_loop(asyncio.get_running_loop())
 
     # Iniciar el bucle de lectura de mensajes.
+    reader = await open_stdin_reader()
     while True:
-        message = read_message()
+        message = await read_message_async(reader)
         if message is None:
             # La conexión se cerró (navegador o pipe)
-            logger.write("=================== terminado ===================\n") # Simula log de native-messaging.js
+            logger.info("=================== terminado ===================") # Simula log de native-messaging.js
             break
         
         # Enviar el mensaje recibido a la capa RPC para su procesamiento.
         # rpc.receive gestiona si es una petición o una respuesta.
         rpc.receive(message, send_message)
-        
-    sys.exit(0) # Salir después de que el pipe se cierre.
\ No newline at end of file
+
+def start_loop():
+    """Ejecuta el bucle asyncio de Native Messaging hasta que se cierre stdin."""
+    try:
+        asyncio.run(messaging_loop())
+    finally:
+        # Las respuestas que esperaban en el lote salen antes de cerrar el escritor
+        rpc.flush_batch()
+        stop_writer() # Escribir las respuestas pendientes antes de salir
+    sys.exit(0) # Salir después de que el pipe se cierre.
+
+# Nombre anterior del punto de entrada
+start_messaging_loop = start_loop
@@ -0,0 +1,158 @@
+# vdhcoapp_py/probe_cache.py
+
+# Caché LRU de resultados de ffprobe para converter.probe.
+# Un archivo local se identifica por (ruta, tamaño, mtime, inodo): si cambia, la clave
+# deja de coincidir y la entrada anterior se invalida. Una URL se identifica por la
+# propia URL y sus encabezados, y caduca tras URL_TTL segundos. Opcionalmente, las
+# entradas de archivos locales se guardan en un JSON para reutilizarlas entre arranques.
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from . import rpc
+from . import logger
+
+# --- CONFIGURACIÓN ---
+MAX_ENTRIES = 256 # Entradas en memoria antes de expulsar la menos usada
+URL_TTL = 300.0 # Segundos de validez del sondeo de una URL
+PERSIST_FILE = os.environ.get("VDH_PROBE_CACHE_FILE") # Sin definir: solo en memoria
+
+entries = OrderedDict() # {clave: {'value': resultado, 'expires': float | None}}
+paths = {} # {(ruta, variante): clave vigente}, para invalidar versiones anteriores de un archivo
+cache_lock = threading.Lock()
+counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+loaded = False
+
+# --- CLAVES ---
+
+def make_key(target, headers=None, variant=""):
+    """
+    Clave de caché de 'target'. Devuelve (clave, ruta) con ruta=None para URLs.
+    'variant' distingue los distintos tipos de sondeo del mismo archivo.
+    """
+    try:
+        st = os.stat(target)
+    except (OSError, ValueError):
+        header_items = tuple(sorted((h['name'], str(h.get('value'))) for h in headers or []))
+        return ("url", target, header_items, variant), None
+    path = os.path.realpath(target)
+    return ("file", path, st.st_size, st.st_mtime_ns, st.st_ino, variant), path
+
+# --- PERSISTENCIA ---
+
+def load():
+    """Carga las entradas persistidas (una sola vez, en el primer uso)."""
+    global loaded
+    loaded = True
+    if not PERSIST_FILE or not os.path.isfile(PERSIST_FILE):
+        return
+    try:
+        with open(PERSIST_FILE, "r", encoding="utf-8") as f:
+            for key, value in json.load(f):
+                key = tuple(key)
+                # Descartar los archivos que han cambiado o desaparecido desde entonces
+                if make_key(key[1], variant=key[-1])[0] != key:
+                    continue
+                entries[key] = {'value': value, 'expires': None}
+                paths[(key[1], key[-1])] = key
+    except Exception as e:
+        logger.warn(f"Caché de sondeo persistente ilegible ({PERSIST_FILE}): {e}")
+
+def save():
+    """Guarda las entradas de archivos locales (escritura atómica)."""
+    if not PERSIST_FILE:
+        return
+    with cache_lock:
+        data = [[list(key), slot['value']] for key, slot in entries.items() if key[0] == "file"]
+    tmp_path = PERSIST_FILE + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, PERSIST_FILE)
+    except Exception as e:
+        logger.warn(f"No se pudo guardar la caché de sondeo en {PERSIST_FILE}: {e}")
+
+# --- API ---
+
+def lookup(key):
+    """Devuelve (True, valor) si la clave está en caché y vigente; (False, None) si no."""
+    with cache_lock:
+        if not loaded:
+            load()
+        slot = entries.get(key)
+        if slot and slot['expires'] is not None and slot['expires'] < time.monotonic():
+            del entries[key]
+            counters['invalidations'] += 1
+            slot = None
+        if not slot:
+            counters['misses'] += 1
+            return False, None
+        entries.move_to_end(key)
+        counters['hits'] += 1
+        return True, slot['value']
+
+def store(key, path, value):
+    """Guarda un resultado, invalidando la versión anterior del archivo y expulsando por LRU."""
+    with cache_lock:
+        if path:
+            previous = paths.get((path, key[-1]))
+            if previous and previous != key and previous in entries:
+                del entries[previous] # El archivo cambió (tamaño, mtime o inodo)
+                counters['invalidations'] += 1
+            paths[(path, key[-1])] = key
+        entries[key] = {'value': value, 'expires': None if path else time.monotonic() + URL_TTL}
+        entries.move_to_end(key)
+        while len(entries) > MAX_ENTRIES:
+            old_key, _ = entries.popitem(last=False)
+            if old_key[0] == "file" and paths.get((old_key[1], old_key[-1])) == old_key:
+                del paths[(old_key[1], old_key[-1])]
+            counters['evictions'] += 1
+    if path:
+        save()
+
+def cached(target, headers, variant, compute):
+    """Devuelve el sondeo de 'target' desde la caché o lo calcula con compute() y lo guarda."""
+    key, path = make_key(target, headers, variant)
+    found, value = lookup(key)
+    if found:
+        return value
+    value = compute()
+    store(key, path, value)
+    return value
+
+def clear():
+    """Vacía la caché (y su archivo persistente)."""
+    with cache_lock:
+        entries.clear()
+        paths.clear()
+    save()
+
+def stats():
+    """Contadores de aciertos/fallos y ocupación de la caché."""
+    with cache_lock:
+        return {**counters, "entries": len(entries), "maxEntries": MAX_ENTRIES,
+                "urlTtl": URL_TTL, "persistFile": PERSIST_FILE}
+
+# --- MÉTODOS RPC ---
+
+def rpc_configure(options):
+    """Ajusta la caché desde la extensión: {maxEntries, urlTtl, persistFile}."""
+    global MAX_ENTRIES, URL_TTL, PERSIST_FILE, loaded
+    if options.get('maxEntries'):
+        MAX_ENTRIES = max(1, int(options['maxEntries']))
+    if options.get('urlTtl') is not None:
+        URL_TTL = float(options['urlTtl'])
+    if 'persistFile' in options:
+        PERSIST_FILE = options['persistFile'] or None
+        loaded = False # Cargar el nuevo archivo en el siguiente uso
+    return stats()
+
+# Registrar los métodos RPC
+rpc.listen({
+    "probeCache.stats": stats,
+    "probeCache.clear": clear,
+    "probeCache.configure": rpc_configure
+})
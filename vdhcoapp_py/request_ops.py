@@ -5,18 +5,34 @@ import os
 import json
 import threading
 import time
-import requests # Usamos requests como el cliente HTTP
 import base64
+import codecs
+import tempfile
 from collections import deque
 from io import BytesIO
 
 from . import rpc
 from . import logger
+from . import transport
 
 # Constantes definidas en request.js
 MAX_SIZE = 50000
 EXPIRE_DATA_TIMEOUT = 30000 # 30 segundos
 
+# Modos de transporte de requestBinary (options.transport):
+#   "array"  -> lista de enteros (por defecto, compatible con la extensión original)
+#   "base64" -> cadena Base64, ~4x más compacta y rápida de serializar que la lista
+# options.chunkSize permite fragmentos mayores hasta el límite de 1 MB de Native Messaging
+# (cada byte ocupa hasta 4 caracteres como lista de enteros y 4/3 en Base64).
+NATIVE_MESSAGE_LIMIT = 1024 * 1024
+ENVELOPE_RESERVE = 4096 # Margen para el resto del mensaje RPC
+MAX_CHUNK_SIZE = {
+    "array": (NATIVE_MESSAGE_LIMIT - ENVELOPE_RESERVE) // 4,
+    "base64": (NATIVE_MESSAGE_LIMIT - ENVELOPE_RESERVE) // 4 * 3,
+}
+HIGH_WATER_MARK = 8 * 1024 * 1024 # Bytes sin consumir antes de pausar la lectura del socket
+LONG_POLL_TIMEOUT = 5000 # ms máximos que requestExtra espera datos antes de responder vacío
+
 current_index = 0
 request_store = {} # {id: {url, data/deque, type, running, timer, ...}}
 
@@ -53,6 +69,117 @@ def clear_timer_and_remove(id):
     req_info = request_store.pop(id, None)
     if req_info and req_info.get('timer'):
         req_info['timer'].cancel()
+    if req_info and 'cond' in req_info:
+        close_buffer(req_info)
+
+# --- BÚFER ACOTADO DEL STREAMING ---
+# El hilo de streaming deja de leer del socket cuando hay 'high_water' bytes sin
+# consumir en memoria (contrapresión). Con 'spill' activado, en lugar de pausar,
+# el exceso se vuelca a un archivo temporal y se lee de él en orden.
+
+def new_buffer(options):
+    """Campos de estado del búfer acotado para una entrada de request_store."""
+    return {
+        'cond': threading.Condition(),
+        'buffered': 0, # Bytes en memoria (deque)
+        'high_water': max(1, int(options.get('highWaterMark') or HIGH_WATER_MARK)),
+        'spill': tempfile.TemporaryFile() if options.get('spill') else None,
+        'spill_read': 0, # Posición de lectura en el archivo de volcado
+        'spill_write': 0, # Posición de escritura en el archivo de volcado
+        'closed': False
+    }
+
+def push_chunk(req_info, chunk):
+    """
+    Añade un fragmento al búfer. Bloquea mientras la memoria esté llena (sin volcado)
+    o lo escribe en el archivo temporal (con volcado). Devuelve False si la
+    solicitud se cerró y el hilo de streaming debe detenerse.
+    """
+    with req_info['cond']:
+        spill = req_info['spill']
+        spill_pending = req_info['spill_write'] > req_info['spill_read']
+        if spill and (spill_pending or req_info['buffered'] >= req_info['high_water']):
+            # Mientras quede algo en el volcado, todo va al volcado para conservar el orden
+            spill.seek(req_info['spill_write'])
+            spill.write(chunk)
+            req_info['spill_write'] += len(chunk)
+        else:
+            while req_info['buffered'] >= req_info['high_water'] and not req_info['closed']:
+                req_info['cond'].wait()
+            if req_info['closed']:
+                return False
+            req_info['data'].append(chunk)
+            req_info['buffered'] += len(chunk)
+        req_info['cond'].notify_all()
+        return not req_info['closed']
+
+def take_chunks(req_info, size):
+    """Extrae hasta 'size' bytes en orden (memoria primero, después el volcado)."""
+    ret_buffers = []
+    ret_length = 0
+    with req_info['cond']:
+        data = req_info['data']
+
+        # Extraer fragmentos completos
+        while data and ret_length + len(data[0]) <= size:
+            buffer = data.popleft()
+            ret_buffers.append(buffer)
+            ret_length += len(buffer)
+
+        # Si aún queda espacio, tomar una porción parcial del siguiente fragmento
+        remaining_length = size - ret_length
+        if data and remaining_length > 0:
+            buffer = data.popleft()
+            buffer2 = buffer[:remaining_length]
+            ret_buffers.append(buffer2)
+            ret_length += len(buffer2)
+
+            # Devolver el resto del fragmento a la cola
+            buffer3 = buffer[remaining_length:]
+            if buffer3:
+                data.appendleft(buffer3)
+
+        req_info['buffered'] -= ret_length
+
+        # La memoria se vació: continuar con lo volcado a disco
+        spill = req_info['spill']
+        if not data and spill and ret_length < size and req_info['spill_write'] > req_info['spill_read']:
+            spill.seek(req_info['spill_read'])
+            buffer = spill.read(min(size - ret_length, req_info['spill_write'] - req_info['spill_read']))
+            req_info['spill_read'] += len(buffer)
+            ret_buffers.append(buffer)
+            if req_info['spill_read'] == req_info['spill_write']:
+                # Volcado consumido: reiniciar para no crecer sin límite
+                spill.seek(0)
+                spill.truncate()
+                req_info['spill_read'] = req_info['spill_write'] = 0
+
+        req_info['cond'].notify_all() # Despertar al hilo de streaming si estaba en pausa
+    return ret_buffers
+
+def has_buffered(req_info):
+    """Indica si quedan datos pendientes en memoria o en el volcado."""
+    return bool(req_info['data']) or req_info['spill_write'] > req_info['spill_read']
+
+def buffer_status(req_info):
+    """Nivel de llenado del búfer, incluido en cada respuesta binaria."""
+    return {
+        "buffered": req_info['buffered'],
+        "spilled": req_info['spill_write'] - req_info['spill_read'],
+        "highWaterMark": req_info['high_water']
+    }
+
+def close_buffer(req_info):
+    """Libera el búfer y despierta al hilo de streaming para que termine."""
+    with req_info['cond']:
+        req_info['closed'] = True
+        req_info['data'].clear()
+        req_info['buffered'] = 0
+        if req_info['spill']:
+            req_info['spill'].close()
+            req_info['spill'] = None
+        req_info['spill_read'] = req_info['spill_write'] = 0
+        req_info['cond'].notify_all()
 
 def reset_timer(req_info, id):
     """Reinicia el temporizador de expiración para la entrada de solicitud."""
@@ -79,70 +206,95 @@ def get_data_from_store(id):
     
     reset_timer(req_info, id)
 
-    data = None
-    more = True
+    # Mismo búfer para texto (request) y binario (requestBinary)
+    ret_buffers = take_chunks(req_info, req_info['chunk_size'])
+    more = req_info['running'] or has_buffered(req_info)
+    status = buffer_status(req_info)
 
-    if req_info['type'] == "buffer": # requestBinary
-        ret_buffers = []
-        ret_length = 0
-        
-        # Extraer fragmentos completos
-        while req_info['data'] and ret_length + len(req_info['data'][0]) <= MAX_SIZE:
-            buffer = req_info['data'].popleft()
-            ret_buffers.append(buffer)
-            ret_length += len(buffer)
-        
-        # Si aún queda espacio, tomar una porción parcial del siguiente fragmento
-        remaining_length = MAX_SIZE - ret_length
-        if req_info['data'] and remaining_length > 0:
-            buffer = req_info['data'].popleft()
-            buffer2 = buffer[:remaining_length]
-            ret_buffers.append(buffer2)
-            ret_length += len(buffer2)
-            
-            # Devolver el resto del fragmento a la cola
-            buffer3 = buffer[remaining_length:]
-            if buffer3:
-                req_info['data'].appendleft(buffer3)
+    if not more:
+        clear_timer_and_remove(id)
 
-        more = req_info['running'] or bool(req_info['data'])
-        
-        if not more:
-            clear_timer_and_remove(id)
-            
-        if ret_buffers:
-            data = b"".join(ret_buffers)
-        elif not more:
-            data = b"" # Búfer vacío
-        else:
-            # Esperando datos del hilo de descarga
-            raise Exception("WaitingForData") 
-            
-    else: # Tipo 'text' (request)
-        start = req_info['position']
-        end = start + MAX_SIZE
-        data = req_info['data'][start:end]
-        req_info['position'] += len(data)
-
-        if req_info['position'] == len(req_info['data']):
-            more = False
-            clear_timer_and_remove(id)
+    if not ret_buffers and more:
+        # Esperando datos del hilo de descarga
+        raise Exception("WaitingForData")
 
     # El resultado final se devuelve como diccionario
-    if data is not None:
-        return {
-            "id": id,
-            # Devolver lista de bytes para datos binarios (compatible con test suite JS)
-            "data": data.decode('utf-8') if req_info['type'] == 'text' else list(data), 
-            "more": more
-        }
+    if req_info['type'] == "text":
+        return {"id": id, "data": "".join(ret_buffers), "more": more}
+    return {**encode_binary_reply(id, b"".join(ret_buffers), more, req_info['encoding']), "buffer": status}
 
-    raise Exception("WaitingForData")
+def empty_reply(id, req_info):
+    """Respuesta vacía con 'more' para que la extensión vuelva a pedir datos."""
+    if req_info.get('type') == "text":
+        return {"id": id, "data": "", "more": True}
+    reply = encode_binary_reply(id, b"", True, req_info.get('encoding'))
+    if 'cond' in req_info:
+        reply['buffer'] = buffer_status(req_info)
+    return reply
+
+def stream_response(req_info, r, decoder=None):
+    """
+    Vuelca el cuerpo de la respuesta en el búfer acotado de la solicitud.
+    Con 'decoder' (texto) decodifica incrementalmente, respetando los
+    caracteres multibyte partidos entre dos fragmentos.
+    """
+    try:
+        with r:
+            for chunk in r.iter_content(chunk_size=req_info['chunk_size']):
+                if decoder:
+                    chunk = decoder.decode(chunk)
+                if chunk and not push_chunk(req_info, chunk):
+                    return # La solicitud expiró o se cerró: dejar de leer
+            if decoder:
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    push_chunk(req_info, tail)
+
+        # Fin del stream
+        with req_info['cond']:
+            req_info['running'] = False
+            req_info['cond'].notify_all()
+
+    except Exception as e:
+        fail_request(req_info, e)
+
+def fail_request(req_info, error):
+    """Registra el error del stream; se propagará en el siguiente requestExtra."""
+    if req_info.get('timer'):
+        req_info['timer'].cancel()
+
+    with req_info['cond']:
+        req_info['error'] = Exception(str(error))
+        req_info['running'] = False
+        req_info['cond'].notify_all()
+
+def encode_binary_reply(id, data, more, encoding):
+    """Codifica un fragmento binario según el modo de transporte negociado."""
+    if encoding == "base64":
+        return {"id": id, "data": base64.b64encode(data).decode('ascii'), "encoding": "base64", "more": more}
+    # Devolver lista de bytes para datos binarios (compatible con test suite JS)
+    return {"id": id, "data": list(data), "more": more}
+
+def negotiate_transport(options):
+    """
+    Determina el modo de transporte y el tamaño de fragmento de requestBinary.
+    Modos desconocidos caen en "array" para no romper extensiones antiguas.
+    """
+    encoding = options.get('transport', "array")
+    if encoding not in MAX_CHUNK_SIZE:
+        encoding = "array"
+    chunk_size = int(options.get('chunkSize') or MAX_SIZE)
+    chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE[encoding]))
+    return encoding, chunk_size
 
 # --- MÉTODOS RPC ---
 
 def rpc_request(url, options={}):
-    """Realiza una solicitud HTTP y devuelve el primer fragmento de texto."""
+    """
+    Realiza una solicitud HTTP y devuelve el primer fragmento de texto en cuanto llega.
+    El cuerpo se descarga y decodifica en streaming; la memoria queda acotada por
+    el búfer (options.highWaterMark) en lugar de por el tamaño de la respuesta.
+    """
     global current_index
     current_index += 1
     id = current_index
@@ -152,38 +304,94 @@ def rpc_request(url, options={}):
     req_options = {
         'headers': get_got_headers(options.get('headers', [])),
         'proxies': get_got_proxy(options.get('proxy')),
+        'stream': True
     }
     
+    r = None
     try:
-        # Usamos requests para una solicitud simple (sin streaming)
-        r = requests.request(method, url, **req_options)
+        # Las cabeceras se reciben aquí para que los errores HTTP se propaguen a la llamada
+        r = transport.request(method, url, **req_options)
         r.raise_for_status()
+    except Exception as e:
+        if r is not None:
+            r.close() # Devuelve la sesión al pool de transporte
+        raise Exception(str(e))
 
-        # Almacenar como texto para su fragmentación
-        request_store[id] = {
-            'url': url,
-            'position': 0,
-            'data': r.text,
-            'type': 'text'
-        }
-        
+    # Almacenar como texto para su fragmentación (el volcado a disco solo aplica a binario)
+    req_info = request_store[id] = {
+        'id': id,
+        'url': url,
+        'type': 'text',
+        'data': deque(),
+        'running': True,
+        'chunk_size': MAX_SIZE,
+        **new_buffer({**options, 'spill': False})
+    }
+    decoder = codecs.getincrementaldecoder(r.encoding or 'utf-8')(errors='replace')
+    threading.Thread(target=stream_response, args=(req_info, r, decoder)).start()
+
+    wait_for_data(req_info, LONG_POLL_TIMEOUT / 1000)
+    try:
         return get_data_from_store(id)
-    
     except Exception as e:
+        if str(e) == "WaitingForData":
+            return empty_reply(id, req_info)
         raise Exception(str(e))
 
-def rpc_request_extra(id):
-    """Solicita el siguiente fragmento de una solicitud HTTP activa."""
+def wait_for_data(req_info, timeout):
+    """
+    Espera (long-poll) hasta que haya datos, el stream termine o pase 'timeout'.
+    Condition.wait libera el candado mientras espera, así que el hilo de
+    streaming puede seguir añadiendo fragmentos. Si la extensión cancela la
+    petición (rpc._cancel), la espera termina en el acto.
+    """
+    cond = req_info['cond']
+
+    def wake():
+        with cond:
+            cond.notify_all()
+
+    rpc.on_cancel(wake)
+    with cond:
+        cond.wait_for(
+            lambda: has_buffered(req_info) or not req_info['running']
+                    or req_info['closed'] or req_info.get('error') or rpc.is_cancelled(),
+            timeout
+        )
+
+def rpc_request_extra(id, options=None):
+    """
+    Solicita el siguiente fragmento de una solicitud HTTP activa.
+    Si aún no hay datos, espera hasta options.timeout milisegundos
+    (LONG_POLL_TIMEOUT por defecto) antes de devolver un fragmento vacío.
+    """
+    options = options or {}
+    req_info = request_store.get(id)
+    if req_info and 'cond' in req_info:
+        timeout = options.get('timeout')
+        wait_for_data(req_info, (timeout if timeout is not None else LONG_POLL_TIMEOUT) / 1000)
+
     try:
         return get_data_from_store(id)
     except Exception as e:
-        # Si está esperando datos, devuelve un fragmento vacío para reintento
+        # Tras agotar la espera sin datos, devuelve un fragmento vacío para reintento
         if str(e) == "WaitingForData":
-             return {"id": id, "data": [], "more": True}
+             return empty_reply(id, request_store.get(id) or {})
         raise
 
 def rpc_request_binary(url, options={}):
-    """Inicia una solicitud HTTP binaria en streaming (fragmentada)."""
+    """
+    Inicia una solicitud HTTP binaria en streaming (fragmentada).
+
+    Opciones adicionales:
+        transport (str): "array" (por defecto) o "base64"; la respuesta incluye
+            "encoding": "base64" cuando se usa Base64.
+        chunkSize (int): bytes por fragmento (por defecto MAX_SIZE, máximo según el modo).
+        highWaterMark (int): bytes sin consumir a partir de los cuales se pausa la lectura
+            del socket (por defecto HIGH_WATER_MARK).
+        spill (bool): volcar el exceso a un archivo temporal en lugar de pausar.
+    La respuesta incluye "buffer": {buffered, spilled, highWaterMark}.
+    """
     global current_index
     current_index += 1
     id = current_index
@@ -194,31 +402,30 @@ def rpc_request_binary(url, options={}):
         'stream': True
     }
     
+    encoding, chunk_size = negotiate_transport(options)
+    
     req_info = request_store[id] = {
         'id': id,
         'type': 'buffer',
         'data': deque(), 
-        'running': True
+        'running': True,
+        'encoding': encoding,
+        'chunk_size': chunk_size,
+        **new_buffer(options)
     }
 
     def streaming_thread(url, req_options):
         """Hilo para la descarga binaria en streaming."""
+        r = None
         try:
-            with requests.get(url, **req_options) as r:
-                r.raise_for_status()
-                for chunk in r.iter_content(chunk_size=MAX_SIZE):
-                    if chunk:
-                        req_info['data'].append(chunk) 
-            
-            # Fin del stream
-            req_info['running'] = False
-        
+            r = transport.get(url, **req_options)
+            r.raise_for_status()
         except Exception as e:
-            if req_info.get('timer'):
-                req_info['timer'].cancel()
-            
-            req_info['error'] = Exception(str(e))
-            req_info['running'] = False
+            if r is not None:
+                r.close() # Devuelve la sesión al pool de transporte
+            fail_request(req_info, e)
+            return
+        stream_response(req_info, r) # Cierra la respuesta al terminar
         
     # Iniciar el hilo de streaming
     threading.Thread(target=streaming_thread, args=(url, req_options)).start()
@@ -227,7 +434,7 @@ def rpc_request_binary(url, options={}):
     try:
         return get_data_from_store(id)
     except Exception as e:
-        return {"id": id, "data": [], "more": True}
+        return empty_reply(id, req_info)
 
 
 # Registrar los métodos RPC
@@ -1,10 +1,13 @@
 # vdhcoapp_py/rpc.py
 
-import json
+import asyncio
+import inspect
 import threading
-import traceback
-import sys
-from concurrent.futures import Future
+import time
+import contextvars
+
+from .workers import BoundedExecutor
+from . import logger as log_config
 
 # Variable para generar IDs de solicitud únicos (similar a guuid en JS).
 global_uuid = 0
@@ -14,51 +17,482 @@ promise_map = {}
 handler_map = {}
 # Objeto para enviar mensajes al proceso principal (configurado por native_messaging.py).
 post_function = None
-# Objeto para logging (simplemente usamos console/stderr por ahora).
-logger = sys.stderr
+# Función para enviar varios mensajes en un solo frame (configurada por native_messaging.py).
+post_batch_function = None
+# Objeto para logging (por defecto el módulo logger, con cola y niveles).
+logger = log_config
+# Bucle asyncio que lee stdin y ejecuta los manejadores (configurado por native_messaging.py).
+loop = None
+# Tareas de peticiones en curso (referencia fuerte para que no las recoja el GC).
+pending_tasks = set()
+
+# --- POOL DE EJECUCIÓN DE PETICIONES ---
+# Las peticiones entrantes se reparten en carriles, cada uno con su pool de hilos y
+# su cola acotada. El carril "fast" atiende llamadas baratas (metadatos, búsquedas)
+# para que no queden detrás de trabajos largos (converter.*, request...) del carril
+# "default"; "stream" atiende requestExtra, que puede esperar datos (long-poll).
+LANES = {
+    "fast": {"workers": 2, "queue": 256},
+    "stream": {"workers": 8, "queue": 256},
+    "default": {"workers": 16, "queue": 256},
+}
+METHOD_LANES = {
+    "ping": "fast",
+    "env": "fast",
+    "listFiles": "fast",
+    "path.homeJoin": "fast",
+    "getParents": "fast",
+    "makeUniqueFileName": "fast",
+    "tmp.tmpName": "fast",
+    "fs.stat": "fast",
+    "downloads.search": "fast",
+    "rpc.poolStats": "fast",
+    "requestExtra": "stream",
+}
+QUEUE_PUT_TIMEOUT = 0 # El bucle asyncio nunca espera hueco en la cola: rechaza de inmediato
+executors = {}
+
+# --- CARGA DIFERIDA DE MÓDULOS ---
+# Para arrancar rápido, los módulos pesados (requests, ffmpeg...) no se importan al
+# inicio: main.py registra un cargador por prefijo de método ("downloads.") o por
+# nombre exacto ("request"), y el módulo se importa con la primera petición que lo usa.
+lazy_loaders = {} # {prefijo o método: función que importa el módulo y registra sus métodos}
+lazy_lock = threading.Lock()
+
+# --- PETICIONES EN CURSO Y CANCELACIÓN ---
+# Cada petición entrante se registra en 'inflight' mientras se ejecuta (método, inicio,
+# hilo). La extensión puede cancelarla con {"type": "weh#rpc", "_cancel": id}: se
+# cancela la tarea y se activa su evento, que los manejadores síncronos consultan con
+# rpc.is_cancelled(). Las llamadas salientes caducan tras 'timeout' segundos; al
+# caducar se retira su Future de promise_map y se envía el mismo aviso de cancelación.
+DEFAULT_CALL_TIMEOUT = 120.0
+inflight = {} # {request_id: {method, start, thread, task, cancelled, callbacks, worker}}
+outgoing = {} # {request_id: {method, start, timeout}}
+current_request = contextvars.ContextVar('current_request', default=None)
+
+# --- AGRUPACIÓN DE MENSAJES (BATCH) ---
+# Con una extensión que lo anuncie en 'rpc.capabilities', los mensajes salientes se
+# acumulan durante BATCH_WINDOW segundos (o hasta BATCH_MAX_MESSAGES) y se envían en
+# un único frame {"type": "weh#rpc-batch", "messages": [...]}. Los lotes entrantes se
+# aceptan siempre. Sin negociación, cada mensaje sigue yendo en su propio frame.
+BATCH_TYPE = "weh#rpc-batch"
+BATCH_WINDOW = 0.005
+BATCH_MAX_MESSAGES = 64
+batch_enabled = False
+batch_buffer = []
+batch_timer = None
+
+# --- RESPUESTAS EN STREAMING ---
+# Un manejador generador (def con yield, o async def con yield) envía cada valor
+# producido como {"_reply": id, "_partial": valor, "_seq": n} y cierra con
+# {"_reply": id, "_result": final, "_end": true}. 'final' es el valor de retorno del
+# generador o, si no devuelve nada, el último valor producido. Con extensiones que no
+# anuncian "stream" en 'rpc.capabilities' solo se envía esa respuesta final.
+stream_enabled = False
+partial_handlers = {} # {request_id: función que recibe los _partial de una llamada saliente}
 
 def set_post(post_func):
     """Establece la función para enviar el mensaje serializado de vuelta al navegador."""
     global post_function
     post_function = post_func
 
+def set_post_batch(post_batch_func):
+    """Establece la función que envía una lista de mensajes en un solo frame."""
+    global post_batch_function
+    post_batch_function = post_batch_func
+
+def set_loop(event_loop):
+    """Establece el bucle asyncio en el que se despachan las peticiones."""
+    global loop
+    loop = event_loop
+
 def set_logger(log_obj):
     """Establece el objeto de logging."""
     global logger
     logger = log_obj
 
+def set_debug_level(level):
+    """Nivel de depuración del protocolo: 0=WARNING, 1=INFO, 2=DEBUG (cuerpos de mensajes)."""
+    level = max(0, min(int(level), 2))
+    log_config.set_level(log_config.DEBUG_LEVELS[level])
+
+def get_executor(method_name):
+    """Devuelve (creándolo si hace falta) el pool del carril asignado al método."""
+    lane = METHOD_LANES.get(method_name, "default")
+    executor = executors.get(lane)
+    if not executor:
+        settings = LANES[lane]
+        executor = executors[lane] = BoundedExecutor(lane, settings['workers'], settings['queue'],
+                                                     put_timeout=QUEUE_PUT_TIMEOUT)
+    return executor
+
+def configure_pool(lanes=None, method_lanes=None):
+    """
+    Ajusta los carriles: lanes = {carril: {workers, queue}}, method_lanes = {método: carril}.
+    Los pools existentes terminan sus tareas y se recrean con el nuevo tamaño.
+    """
+    if lanes:
+        for lane, settings in lanes.items():
+            LANES[lane] = {**LANES.get(lane, LANES['default']), **settings}
+            old = executors.pop(lane, None)
+            if old:
+                old.shutdown(wait=False)
+    if method_lanes:
+        METHOD_LANES.update(method_lanes)
+
+async def rpc_configure_pool(options=None):
+    """
+    Ajusta los carriles desde la extensión: {"lanes": {carril: {workers, queue}},
+    "methodLanes": {método: carril}}. Devuelve la configuración resultante; los pools
+    se recrean con la siguiente petición de cada carril.
+    Se ejecuta en el bucle, que es el único que crea y consulta los pools.
+    """
+    options = options or {}
+    lanes = options.get('lanes') or {}
+    method_lanes = options.get('methodLanes') or {}
+    for lane, settings in lanes.items():
+        for key, value in settings.items():
+            if key not in ("workers", "queue"):
+                raise Exception(f"Opción de carril desconocida: '{key}'")
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise Exception(f"'{key}' del carril '{lane}' debe ser un entero positivo")
+    for method, lane in method_lanes.items():
+        if lane not in LANES and lane not in lanes:
+            raise Exception(f"Carril desconocido para '{method}': '{lane}'")
+    configure_pool(lanes, method_lanes)
+    return {"lanes": LANES, "methodLanes": METHOD_LANES}
+
+def pool_stats():
+    """Métricas de cada carril (hilos, cola, completadas, rechazadas...)."""
+    return {lane: executor.stats() for lane, executor in executors.items()}
+
 def listen(listeners):
     """Registra los manejadores de métodos que la extensión puede llamar."""
     global handler_map
     handler_map.update(listeners)
 
+def listen_lazy(loaders):
+    """Registra cargadores diferidos: {"prefijo." o "método": cargador}."""
+    lazy_loaders.update(loaders)
+
+def load_lazy(method_name):
+    """
+    Ejecuta el cargador más específico para 'method_name' (una sola vez).
+    Las peticiones simultáneas esperan en el candado a que termine la importación.
+    """
+    with lazy_lock:
+        matches = [key for key in lazy_loaders
+                   if key == method_name or (key.endswith(".") and method_name.startswith(key))]
+        if not matches:
+            return False
+        key = max(matches, key=len)
+        lazy_loaders[key]()
+        del lazy_loaders[key] # Solo si la importación tuvo éxito
+        return True
+
+def flush_batch():
+    """Envía los mensajes acumulados (en el hilo del bucle)."""
+    global batch_timer
+    if batch_timer:
+        batch_timer.cancel()
+        batch_timer = None
+    if not batch_buffer:
+        return
+    messages = batch_buffer[:]
+    batch_buffer.clear()
+    post_batch_function(messages)
+
+def post(message, send=None):
+    """
+    Envía un mensaje saliente, agrupándolo si el lote está negociado.
+    Solo se llama desde el hilo del bucle, por lo que el búfer no necesita candado.
+    """
+    global batch_timer
+    send = send or post_function
+    if not (batch_enabled and post_batch_function):
+        send(message)
+        return
+    batch_buffer.append(message)
+    if len(batch_buffer) >= BATCH_MAX_MESSAGES:
+        flush_batch()
+    elif not batch_timer:
+        batch_timer = asyncio.get_running_loop().call_later(BATCH_WINDOW, flush_batch)
+
+def enable_capabilities(peer_capabilities):
+    """Aplica las capacidades anunciadas por la extensión."""
+    global stream_enabled
+    stream_enabled = bool(peer_capabilities.get('stream'))
+    enable_batching(bool(peer_capabilities.get('batch')))
+
+def enable_batching(enabled):
+    """Activa o desactiva el envío por lotes, vaciando lo pendiente al desactivar."""
+    global batch_enabled
+    batch_enabled = enabled
+    if not enabled:
+        flush_batch()
+
+async def rpc_capabilities(peer_capabilities=None):
+    """
+    Saludo de capacidades: la extensión anuncia las suyas ({"batch": true, "stream": true}) y la CoApp
+    responde con las propias. Se ejecuta en el bucle porque modifica su estado.
+    """
+    peer_capabilities = peer_capabilities or {}
+    # La respuesta a este saludo aún sale en un frame propio; el lote se activa después
+    asyncio.get_running_loop().call_soon(enable_capabilities, peer_capabilities)
+    return {
+        "batch": True,
+        "stream": True,
+        "batchWindow": int(BATCH_WINDOW * 1000),
+        "batchMaxMessages": BATCH_MAX_MESSAGES
+    }
+
+def is_cancelled():
+    """Indica si la petición que ejecuta el manejador actual ha sido cancelada."""
+    entry = current_request.get()
+    return bool(entry and entry['cancelled'].is_set())
+
+def on_cancel(callback):
+    """
+    Registra una función que se llama (en el hilo del bucle) si se cancela la petición
+    actual; sirve para despertar a un manejador bloqueado en una espera. Si la
+    cancelación llega antes del registro no se llama: comprobar también is_cancelled().
+    """
+    entry = current_request.get()
+    if entry:
+        entry['callbacks'].append(callback)
+
+def run_handler(entry, handler, args):
+    """Ejecuta un manejador síncrono en un hilo del pool, anotando el hilo en el registro."""
+    entry['thread'] = threading.current_thread().name
+    return handler(*args)
+
+def cancel_request(request_id):
+    """Cancela una petición entrante en curso. Devuelve False si ya no existe."""
+    entry = inflight.get(request_id)
+    if not entry:
+        return False
+    entry['cancelled'].set()
+    entry['task'].cancel()
+    for callback in list(entry['callbacks']):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"RPC: Error al avisar de la cancelación de {request_id}: {e}")
+    return True
+
+async def inflight_requests():
+    """
+    Lista las peticiones entrantes en curso y las llamadas salientes pendientes.
+    Se ejecuta en el bucle, que es el único que modifica ambos registros.
+    """
+    now = time.monotonic()
+    return {
+        "incoming": [{
+            "id": request_id,
+            "method": entry['method'],
+            "elapsed": round(now - entry['start'], 3),
+            "thread": entry['thread'],
+            "cancelled": entry['cancelled'].is_set()
+        } for request_id, entry in inflight.items()],
+        "outgoing": [{
+            "id": request_id,
+            "method": entry['method'],
+            "elapsed": round(now - entry['start'], 3),
+            "timeout": entry['timeout']
+        } for request_id, entry in outgoing.items()]
+    }
+
+async def stream_reply(request_id, method_name, handler, args, entry, send):
+    """
+    Ejecuta un manejador generador enviando cada valor como respuesta parcial.
+    Los generadores síncronos se recorren en un hilo del pool (pueden bloquear entre
+    valores); los asíncronos, en el bucle. Devuelve (resultado final, nº de parciales).
+    """
+    seq = 0
+    last = None
+
+    def emit(item):
+        nonlocal seq, last
+        last = item
+        if stream_enabled:
+            seq += 1
+            post({
+                "type": "weh#rpc",
+                "_reply": request_id,
+                "_partial": item,
+                "_seq": seq
+            }, send)
+
+    if inspect.isasyncgenfunction(handler):
+        generator = handler(*args)
+        try:
+            async for item in generator:
+                emit(item)
+        finally:
+            await generator.aclose()
+        return last, seq
+
+    event_loop = asyncio.get_running_loop()
+
+    def drain():
+        entry['thread'] = threading.current_thread().name
+        generator = handler(*args)
+        try:
+            while not entry['cancelled'].is_set():
+                try:
+                    item = next(generator)
+                except StopIteration as stop:
+                    return stop.value
+                # call_soon_threadsafe conserva el orden: los parciales salen antes que el final
+                event_loop.call_soon_threadsafe(emit, item)
+        finally:
+            generator.close()
+
+    context = contextvars.copy_context()
+    entry['worker'] = get_executor(method_name).submit(context.run, drain)
+    result = await asyncio.wrap_future(entry['worker'])
+    return (last if result is None else result), seq
+
+async def execute_request(request_id, method_name, args, send):
+    """
+    Ejecuta un manejador y envía su respuesta.
+    Las corrutinas (async def) se esperan directamente en el bucle; los manejadores
+    síncronos se delegan al pool del carril del método para no bloquearlo.
+    """
+    entry = inflight[request_id] = {
+        'method': method_name,
+        'start': time.monotonic(),
+        'thread': threading.current_thread().name,
+        'task': asyncio.current_task(),
+        'cancelled': threading.Event(),
+        'callbacks': [], # Avisos de cancelación (rpc.on_cancel)
+        'worker': None # Future del pool para los manejadores síncronos
+    }
+    current_request.set(entry)
+    try:
+        handler = handler_map.get(method_name)
+        if not handler and lazy_loaders:
+            # Primera petición de un módulo diferido: importarlo fuera del bucle
+            await asyncio.to_thread(load_lazy, method_name)
+            handler = handler_map.get(method_name)
+        
+        if not handler:
+            raise Exception(f"Método '{method_name}' no registrado.")
+
+        if inspect.isgeneratorfunction(handler) or inspect.isasyncgenfunction(handler):
+            result, seq = await stream_reply(request_id, method_name, handler, args, entry, send)
+            if stream_enabled:
+                post({
+                    "type": "weh#rpc",
+                    "_reply": request_id,
+                    "_result": result,
+                    "_end": True,
+                    "_seq": seq + 1
+                }, send)
+                return
+        elif inspect.iscoroutinefunction(handler):
+            result = await handler(*args)
+        else:
+            # Si la cola del carril está llena, submit lanza PoolSaturated y se rechaza
+            # la petición en lugar de acumularla. El contexto se copia para que el
+            # manejador vea su petición en rpc.is_cancelled().
+            context = contextvars.copy_context()
+            entry['worker'] = get_executor(method_name).submit(context.run, run_handler, entry, handler, args)
+            result = await asyncio.wrap_future(entry['worker'])
+            if inspect.isawaitable(result):
+                result = await result
+        
+        # Enviar la respuesta de éxito.
+        post({
+            "type": "weh#rpc",
+            "_reply": request_id,
+            "_result": result
+        }, send)
+
+    except asyncio.CancelledError:
+        if not entry['cancelled'].is_set():
+            raise # Cierre del bucle, no una cancelación pedida por la extensión
+        logger.info(f"RPC: Petición {request_id} ('{method_name}') cancelada")
+        post({
+            "type": "weh#rpc",
+            "_reply": request_id,
+            "_error": "Petición cancelada"
+        }, send)
+
+    except Exception as e:
+        logger.error(f"RPC: Error al ejecutar método '{method_name}': {e}")
+        # Enviar respuesta de error.
+        post({
+            "type": "weh#rpc",
+            "_reply": request_id,
+            "_error": str(e) # Enviar solo el mensaje de error como hace JS.
+        }, send)
+
+    finally:
+        worker = entry['worker']
+        if worker and not worker.done():
+            # Cancelada mientras el manejador síncrono sigue en su hilo: la entrada
+            # (marcada como cancelada) se mantiene hasta que el hilo termine
+            event_loop = asyncio.get_running_loop()
+            worker.add_done_callback(lambda _: forget_request(event_loop, request_id))
+        else:
+            inflight.pop(request_id, None)
+
+def forget_request(event_loop, request_id):
+    """Retira una petición del registro desde el hilo del pool que la ejecutaba."""
+    try:
+        event_loop.call_soon_threadsafe(inflight.pop, request_id, None)
+    except RuntimeError:
+        pass # Bucle ya cerrado
+
 def receive(message, send, peer=None):
     """
     Procesa un mensaje entrante (Petición o Respuesta).
     Implementa la lógica central de weh-rpc.js: receive().
+    Debe llamarse desde el hilo del bucle asyncio.
     """
     global logger
     
+    # Lote de mensajes: procesar cada uno en orden
+    if message.get('type') == BATCH_TYPE:
+        for sub_message in message.get('messages', []):
+            receive(sub_message, send, peer)
+
     # Manejo de Respuesta (el navegador responde a una llamada nuestra)
-    if message.get('_reply'):
+    elif message.get('_reply'):
         reply_id = message['_reply']
+
+        # Respuesta parcial de una llamada en streaming: la llamada sigue abierta
+        if '_partial' in message:
+            on_partial = partial_handlers.get(reply_id)
+            if on_partial:
+                on_partial(message['_partial'])
+            return
         # Buscar la promesa (Future) asociada a esta respuesta.
         future_obj = promise_map.pop(reply_id, None)
         
         if not future_obj:
-            logger.write(f"RPC ERROR: Falta manejador de respuesta para ID {reply_id}\n")
+            # Puede ser la respuesta tardía de una llamada que ya caducó
+            logger.warn(f"RPC: Falta manejador de respuesta para ID {reply_id}")
+            return
+        if future_obj.done():
             return
 
         if message.get('_error'):
             # Rechazar la promesa con el mensaje de error.
             error_message = message['_error']
-            logger.write(f"RPC WARNING: Recibido error para ID {reply_id}: {error_message}\n")
+            logger.warn(f"RPC: Recibido error para ID {reply_id}: {error_message}")
             # Usamos una excepción para replicar el comportamiento de rechazo de promesa.
             future_obj.set_exception(Exception(error_message))
         else:
             # Resolver la promesa con el resultado.
             result = message.get('_result')
             future_obj.set_result(result)
+
+    # Cancelación de una petición nuestra en curso
+    elif message.get('_cancel'):
+        if not cancel_request(message['_cancel']):
+            logger.info(f"RPC: Cancelación de una petición inexistente ({message['_cancel']})")
             
     # Manejo de Petición (el navegador nos llama)
     elif message.get('_request'):
@@ -66,47 +500,19 @@ def receive(message, send, peer=None):
         method_name = message.get('_method')
         args = message.get('_args', [])
         
-        # Debe correr en un hilo separado o en un pool de ejecución para no bloquear
-        # la lectura de más mensajes (simulando el asincronismo de Node.js).
-        # Esto previene que una operación larga como 'convert' detenga la comunicación.
-        def execute_request():
-            try:
-                handler = handler_map.get(method_name)
-                
-                if not handler:
-                    raise Exception(f"Método '{method_name}' no registrado.")
-
-                # Ejecutar el método del manejador.
-                result = handler(*args)
-                
-                # Si el resultado es una 'Future' o similar (operación asíncrona),
-                # esperar su finalización (opcionalmente, si se sabe que es síncrono, se omite).
-                # En Python, simplemente esperamos un valor. Si el manejador es asíncrono,
-                # debería estar dentro de un pool o hilo, o la función 'receive' ser async.
-                
-                # Enviar la respuesta de éxito.
-                send({
-                    "type": "weh#rpc",
-                    "_reply": request_id,
-                    "_result": result
-                })
-
-            except Exception as e:
-                logger.write(f"RPC ERROR: Error al ejecutar método '{method_name}': {e}\n")
-                # Enviar respuesta de error.
-                send({
-                    "type": "weh#rpc",
-                    "_reply": request_id,
-                    "_error": str(e) # Enviar solo el mensaje de error como hace JS.
-                })
+        # Cada petición es una tarea del bucle, de modo que una operación larga
+        # como 'convert' no detiene la lectura de más mensajes.
+        task = asyncio.get_running_loop().create_task(execute_request(request_id, method_name, args, send))
+        pending_tasks.add(task)
+        task.add_done_callback(pending_tasks.discard)
 
-        # Ejecutar en un nuevo hilo.
-        threading.Thread(target=execute_request).start()
-
-def call(method, *args):
+async def call(method, *args, timeout=DEFAULT_CALL_TIMEOUT, on_partial=None):
     """
     Realiza una llamada RPC desde la CoApp al navegador (Cliente RPC).
-    Implementa la lógica central de weh-rpc.js: call().
+    Implementa la lógica central de weh-rpc.js: call(). Es una corrutina:
+    desde el bucle se usa con 'await rpc.call(...)'; desde hilos, con call_sync().
+    Lanza TimeoutError si no hay respuesta en 'timeout' segundos (None: sin límite).
+    Si la extensión responde en streaming, on_partial recibe cada valor parcial.
     """
     global global_uuid
     global post_function
@@ -126,16 +532,60 @@ def call(method, *args):
         "_args": list(args),
     }
 
-    # Crear un objeto Future para manejar la respuesta asíncrona.
-    future = Future()
+    # Crear un Future del bucle para manejar la respuesta asíncrona.
+    future = asyncio.get_running_loop().create_future()
     promise_map[request_id] = future
+    if on_partial:
+        partial_handlers[request_id] = on_partial
+    outgoing[request_id] = {'method': method, 'start': time.monotonic(), 'timeout': timeout}
     
     # Enviar la solicitud.
-    post_function(request_message)
+    post(request_message)
+
+    # Esperar el resultado sin bloquear el bucle (equivalente a la promesa de JS).
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        # Avisar a la extensión de que ya no esperamos la respuesta
+        post({"type": "weh#rpc", "_cancel": request_id})
+        if isinstance(e, asyncio.TimeoutError):
+            raise TimeoutError(f"Sin respuesta a '{method}' tras {timeout} s") from None
+        raise
+    finally:
+        promise_map.pop(request_id, None)
+        partial_handlers.pop(request_id, None)
+        outgoing.pop(request_id, None)
+
+def call_sync(method, *args, timeout=DEFAULT_CALL_TIMEOUT):
+    """
+    Versión bloqueante de call() para manejadores síncronos que corren en el pool.
+    No debe usarse desde el hilo del bucle (se bloquearía esperando su propia respuesta).
+    """
+    if not loop:
+        raise Exception("El bucle RPC no está en marcha.")
+    return asyncio.run_coroutine_threadsafe(call(method, *args, timeout=timeout), loop).result()
 
-    # Bloquear y esperar el resultado (simulando la espera de una promesa).
-    # En un entorno Node.js, esto sería asíncrono; aquí es un bloqueo.
-    return future.result()
+def notify(method, *args):
+    """
+    Llamada sin espera desde cualquier hilo (notificaciones de progreso): no bloquea al
+    que la emite y un fallo o falta de respuesta solo se registra en el log.
+    """
+    if not loop:
+        return
+
+    def done(future):
+        if not future.cancelled() and future.exception():
+            logger.warn(f"RPC: Notificación '{method}' fallida: {future.exception()}")
+
+    asyncio.run_coroutine_threadsafe(call(method, *args), loop).add_done_callback(done)
 
 # El resto de módulos de Python (como converter.py o downloads.py) llamarán a rpc.call()
-# para comunicarse con la extensión del navegador (ej. para enviar notificaciones de progreso).
\ No newline at end of file
+# (o rpc.call_sync() desde hilos) para comunicarse con la extensión del navegador
+# (ej. para enviar notificaciones de progreso).
+
+listen({
+    "rpc.poolStats": pool_stats,
+    "rpc.configurePool": rpc_configure_pool,
+    "rpc.capabilities": rpc_capabilities,
+    "rpc.inflight": inflight_requests,
+})
@@ -0,0 +1,452 @@
+# vdhcoapp_py/streams.py
+
+# Descarga nativa de streams HLS (m3u8) y DASH (mpd).
+# El manifiesto se analiza en Python y los segmentos se descargan en paralelo sobre
+# el pool de transporte, con reintentos y descifrado AES-128, escribiéndose en orden
+# en un único archivo de salida. Evita que la extensión tenga que pasar cada segmento
+# por requestBinary/requestExtra en fragmentos JSON de 50 KB.
+#
+# Las descargas se registran en downloads.downloads, por lo que comparten el
+# planificador, la limitación de ancho de banda y downloads.search/cancel.
+
+import math
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from . import rpc
+from . import logger
+from . import transport
+from . import throttle
+from . import downloads
+
+# --- CONFIGURACIÓN ---
+SEGMENT_CONCURRENCY = 6 # Segmentos descargados en paralelo por stream
+SEGMENT_RETRIES = 3 # Reintentos por segmento antes de abortar
+RETRY_BACKOFF = 0.5 # Segundos de espera base entre reintentos (exponencial)
+
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+ISO_DURATION_PATTERN = re.compile(
+    r"^P(?:(?P<days>\d+(?:\.\d+)?)D)?"
+    r"(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+TEMPLATE_PATTERN = re.compile(r"\$(RepresentationID|Number|Time|Bandwidth)(?:%0(\d+)d)?\$")
+
+# --- UTILERÍAS ---
+
+def fetch_bytes(url, req_options, byterange=None):
+    """
+    Descarga un recurso completo (o un rango [inicio, longitud]) como bytes.
+    req_options: encabezados, certificado y proxy (downloads.transfer_options).
+    """
+    if byterange:
+        start, length = byterange
+        req_options = {**req_options, 'headers': {**req_options['headers'], 'Range': f"bytes={start}-{start + length - 1}"}}
+    with transport.get(url, **req_options) as r:
+        r.raise_for_status()
+        return r.content
+
+def fetch_text(url, req_options):
+    """Descarga un manifiesto como texto. Devuelve (texto, url_final tras redirecciones)."""
+    with transport.get(url, **req_options) as r:
+        r.raise_for_status()
+        return r.text, r.url
+
+def parse_attributes(line):
+    """Analiza la lista de atributos de una etiqueta HLS (CLAVE=valor,CLAVE="valor")."""
+    return {key: value.strip('"') for key, value in ATTRIBUTE_PATTERN.findall(line)}
+
+def parse_byterange(value, previous_end):
+    """Convierte 'longitud[@inicio]' en [inicio, longitud]."""
+    length, _, offset = value.partition("@")
+    start = int(offset) if offset else previous_end
+    return [start, int(length)]
+
+def parse_iso_duration(value):
+    """Convierte una duración ISO 8601 (ej. 'PT1H2M3.5S') a segundos."""
+    m = ISO_DURATION_PATTERN.match(value or "")
+    if not m:
+        return None
+    parts = {k: float(v) for k, v in m.groupdict().items() if v}
+    return (parts.get('days', 0) * 86400 + parts.get('hours', 0) * 3600
+            + parts.get('minutes', 0) * 60 + parts.get('seconds', 0))
+
+def decrypt_aes128(data, key, iv):
+    """
+    Descifra un segmento AES-128-CBC con relleno PKCS#7.
+    Requiere el paquete opcional 'cryptography' (o 'pycryptodome').
+    """
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+        plain = decryptor.update(data) + decryptor.finalize()
+    except ImportError:
+        try:
+            from Crypto.Cipher import AES
+        except ImportError:
+            raise Exception("Se necesita 'cryptography' (pip install cryptography) para streams cifrados AES-128.")
+        plain = AES.new(key, AES.MODE_CBC, iv).decrypt(data)
+
+    padding = plain[-1] if plain else 0
+    if 0 < padding <= 16:
+        plain = plain[:-padding]
+    return plain
+
+# --- HLS ---
+
+def parse_m3u8(text, base_url):
+    """
+    Analiza una lista m3u8.
+
+    Returns:
+        dict: {"variants": [...]} para una lista maestra, o
+              {"init": segmento|None, "segments": [...], "live": bool} para una lista de medios.
+              Cada segmento es {url, byterange, key} con key = {uri, iv} o None.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith("#EXTM3U"):
+        raise Exception("El manifiesto no es una lista m3u8 válida")
+
+    variants = []
+    segments = []
+    init = None
+    key = None
+    sequence = 0
+    byterange = None
+    previous_end = 0
+    ended = False
+    pending_variant = None
+
+    for line in lines[1:]:
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            pending_variant = parse_attributes(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-KEY:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            method = attrs.get('METHOD', "NONE")
+            if method == "NONE":
+                key = None
+            elif method == "AES-128":
+                key = {"method": method, "uri": urljoin(base_url, attrs['URI']), "iv": attrs.get('IV')}
+            else:
+                raise Exception(f"Cifrado HLS no soportado: {method}")
+        elif line.startswith("#EXT-X-MAP:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            init = {
+                "url": urljoin(base_url, attrs['URI']),
+                "byterange": parse_byterange(attrs['BYTERANGE'], 0) if attrs.get('BYTERANGE') else None,
+                "key": None
+            }
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byterange = parse_byterange(line.split(":", 1)[1], previous_end)
+        elif line.startswith("#EXT-X-ENDLIST"):
+            ended = True
+        elif line.startswith("#"):
+            continue
+        elif pending_variant is not None:
+            variants.append({
+                "url": urljoin(base_url, line),
+                "bandwidth": int(pending_variant.get('BANDWIDTH', 0)),
+                "resolution": pending_variant.get('RESOLUTION')
+            })
+            pending_variant = None
+        else:
+            segment_key = None
+            if key:
+                # Sin IV explícito, el IV es el número de secuencia del segmento
+                iv = key['iv']
+                iv = bytes.fromhex(iv[2:]) if iv else (sequence + len(segments)).to_bytes(16, "big")
+                segment_key = {"uri": key['uri'], "iv": iv}
+            segments.append({"url": urljoin(base_url, line), "byterange": byterange, "key": segment_key})
+            if byterange:
+                previous_end = byterange[0] + byterange[1]
+            byterange = None
+
+    if variants:
+        return {"variants": variants}
+    return {"init": init, "segments": segments, "live": not ended}
+
+def select_variant(variants, max_bandwidth=None):
+    """Elige la variante de mayor ancho de banda (opcionalmente sin superar max_bandwidth)."""
+    candidates = [v for v in variants if not max_bandwidth or v['bandwidth'] <= max_bandwidth]
+    candidates = candidates or variants
+    return max(candidates, key=lambda v: v['bandwidth'])
+
+def resolve_hls(url, req_options, options):
+    """Descarga y resuelve la lista HLS hasta obtener los segmentos de medios."""
+    text, final_url = fetch_text(url, req_options)
+    playlist = parse_m3u8(text, final_url)
+    if "variants" in playlist:
+        variant = select_variant(playlist['variants'], options.get('maxBandwidth'))
+        text, final_url = fetch_text(variant['url'], req_options)
+        playlist = parse_m3u8(text, final_url)
+        if "variants" in playlist:
+            raise Exception("Lista maestra HLS anidada no soportada")
+    if playlist['live']:
+        logger.warn(f"Lista HLS sin #EXT-X-ENDLIST ({url}); se descargan los segmentos publicados.")
+    return playlist
+
+# --- DASH ---
+
+def mpd_children(element, name):
+    """Hijos directos con el nombre local 'name' (ignorando el namespace)."""
+    return [child for child in element if child.tag.rsplit("}", 1)[-1] == name]
+
+def mpd_child(*elements, name):
+    """Primer hijo 'name' del primer elemento que lo tenga (Representation antes que AdaptationSet)."""
+    for element in elements:
+        children = mpd_children(element, name) if element is not None else []
+        if children:
+            return children[0]
+    return None
+
+def mpd_base_url(base, *elements):
+    """Resuelve los BaseURL anidados (MPD > Period > AdaptationSet > Representation)."""
+    for element in elements:
+        base_element = mpd_child(element, name="BaseURL")
+        if base_element is not None and base_element.text:
+            base = urljoin(base, base_element.text.strip())
+    return base
+
+def expand_template(template, representation_id, bandwidth, number=None, start_time=None):
+    """Sustituye $RepresentationID$, $Number$, $Time$ y $Bandwidth$ (con formato %0Nd)."""
+    values = {"RepresentationID": representation_id, "Bandwidth": bandwidth,
+              "Number": number, "Time": start_time}
+
+    def replace(m):
+        value = values[m.group(1)]
+        if m.group(2) and isinstance(value, int):
+            return str(value).zfill(int(m.group(2)))
+        return str(value)
+
+    return TEMPLATE_PATTERN.sub(replace, template).replace("$$", "$")
+
+def template_segments(template, base, rep_id, bandwidth, duration):
+    """Genera la lista de segmentos de un SegmentTemplate (con o sin SegmentTimeline)."""
+    media = template.get('media')
+    start_number = int(template.get('startNumber', 1))
+    timescale = int(template.get('timescale', 1))
+    urls = []
+
+    timeline = mpd_child(template, name="SegmentTimeline")
+    if timeline is not None:
+        number = start_number
+        current = 0
+        for s in mpd_children(timeline, "S"):
+            current = int(s.get('t', current))
+            d = int(s.get('d'))
+            for _ in range(int(s.get('r', 0)) + 1):
+                urls.append(expand_template(media, rep_id, bandwidth, number, current))
+                number += 1
+                current += d
+    else:
+        segment_duration = int(template.get('duration', 0))
+        if not segment_duration or not duration:
+            raise Exception("SegmentTemplate DASH sin duración de segmento ni SegmentTimeline")
+        count = math.ceil(duration * timescale / segment_duration)
+        urls = [expand_template(media, rep_id, bandwidth, start_number + i) for i in range(count)]
+
+    return [{"url": urljoin(base, u), "byterange": None, "key": None} for u in urls]
+
+def parse_mpd(text, base_url):
+    """
+    Analiza un manifiesto DASH estático.
+
+    Returns:
+        list: representaciones [{id, contentType, mimeType, bandwidth, height, init, segments}]
+    """
+    root = ET.fromstring(text)
+    if root.get('type') == "dynamic":
+        raise Exception("Los manifiestos DASH en directo (type=dynamic) no están soportados")
+
+    total_duration = parse_iso_duration(root.get('mediaPresentationDuration'))
+    representations = []
+
+    for period in mpd_children(root, "Period")[:1]: # Solo el primer periodo
+        duration = parse_iso_duration(period.get('duration')) or total_duration
+        for adaptation in mpd_children(period, "AdaptationSet"):
+            for rep in mpd_children(adaptation, "Representation"):
+                rep_id = rep.get('id')
+                bandwidth = int(rep.get('bandwidth', 0))
+                mime_type = rep.get('mimeType') or adaptation.get('mimeType') or ""
+                content_type = adaptation.get('contentType') or mime_type.split("/")[0]
+                base = mpd_base_url(base_url, root, period, adaptation, rep)
+
+                init = None
+                template = mpd_child(rep, adaptation, name="SegmentTemplate")
+                segment_list = mpd_child(rep, adaptation, name="SegmentList")
+                if template is not None:
+                    if template.get('initialization'):
+                        init = {"url": urljoin(base, expand_template(template.get('initialization'), rep_id, bandwidth)),
+                                "byterange": None, "key": None}
+                    segments = template_segments(template, base, rep_id, bandwidth, duration)
+                elif segment_list is not None:
+                    initialization = mpd_child(segment_list, name="Initialization")
+                    if initialization is not None and initialization.get('sourceURL'):
+                        init = {"url": urljoin(base, initialization.get('sourceURL')), "byterange": None, "key": None}
+                    segments = [{"url": urljoin(base, seg.get('media')), "byterange": None, "key": None}
+                                for seg in mpd_children(segment_list, "SegmentURL")]
+                else:
+                    # SegmentBase o BaseURL simple: un único archivo
+                    segments = [{"url": base, "byterange": None, "key": None}]
+
+                representations.append({
+                    "id": rep_id,
+                    "contentType": content_type,
+                    "mimeType": mime_type,
+                    "bandwidth": bandwidth,
+                    "height": int(rep.get('height') or adaptation.get('height') or 0),
+                    "init": init,
+                    "segments": segments
+                })
+
+    if not representations:
+        raise Exception("El manifiesto DASH no contiene representaciones")
+    return representations
+
+def select_representation(representations, options):
+    """Elige la representación pedida por 'representation' o la mejor del 'contentType' pedido."""
+    if options.get('representation'):
+        for rep in representations:
+            if rep['id'] == options['representation']:
+                return rep
+        raise Exception(f"Representación DASH '{options['representation']}' no encontrada")
+
+    content_type = options.get('contentType', "video")
+    candidates = [r for r in representations if r['contentType'] == content_type] or representations
+    if options.get('maxBandwidth'):
+        candidates = [r for r in candidates if r['bandwidth'] <= options['maxBandwidth']] or candidates
+    return max(candidates, key=lambda r: r['bandwidth'])
+
+def resolve_dash(url, req_options, options):
+    """Descarga el MPD y devuelve la representación seleccionada con su lista de segmentos."""
+    text, final_url = fetch_text(url, req_options)
+    rep = select_representation(parse_mpd(text, final_url), options)
+    return {"init": rep['init'], "segments": rep['segments'], "live": False, "mimeType": rep['mimeType']}
+
+# --- DESCARGA DE SEGMENTOS ---
+
+def get_key(entry, uri, req_options):
+    """Obtiene (y cachea por URI) la clave AES-128 de una descarga."""
+    with entry['lock']:
+        key = entry['keys'].get(uri)
+    if key is None:
+        key = fetch_bytes(uri, req_options)
+        with entry['lock']:
+            entry['keys'][uri] = key
+    return key
+
+def fetch_segment(entry, segment, req_options):
+    """Descarga (y descifra) un segmento con reintentos y retroceso exponencial."""
+    for attempt in range(SEGMENT_RETRIES + 1):
+        if entry['state'] == "interrupted":
+            return b""
+        try:
+            data = fetch_bytes(segment['url'], req_options, segment['byterange'])
+            if segment['key']:
+                key = get_key(entry, segment['key']['uri'], req_options)
+                data = decrypt_aes128(data, key, segment['key']['iv'])
+            throttle.throttle(entry['limiter'], len(data))
+            return data
+        except Exception as e:
+            if attempt == SEGMENT_RETRIES:
+                raise Exception(f"Segmento {segment['url']} fallido tras {SEGMENT_RETRIES} reintentos: {e}")
+            logger.warn(f"Reintentando segmento {segment['url']} ({attempt + 1}/{SEGMENT_RETRIES}): {e}")
+            time.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+def segments_transfer(entry, resolve, req_options, concurrency):
+    """
+    Resuelve el manifiesto y descarga sus segmentos en paralelo, escribiéndolos
+    en orden. Como mucho 2 * concurrency segmentos quedan en memoria a la vez.
+    """
+    playlist = resolve()
+    segments = ([playlist['init']] if playlist['init'] else []) + playlist['segments']
+    entry['segmentsTotal'] = len(segments)
+
+    # Contenedor fMP4/WebM (EXT-X-MAP / DASH): ajustar la extensión salvo nombre explícito
+    if playlist['init'] and not entry['options'].get('filename'):
+        root, _ = os.path.splitext(entry['filename'])
+        entry['filename'] = root + (".webm" if "webm" in playlist.get('mimeType', "") else ".mp4")
+
+    with open(entry['filename'], 'wb') as f, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        entry['file_stream'] = f
+        pending = deque()
+        queue = iter(segments)
+
+        def submit_next():
+            segment = next(queue, None)
+            if segment is not None:
+                pending.append(executor.submit(fetch_segment, entry, segment, req_options))
+
+        for _ in range(concurrency * 2):
+            submit_next()
+
+        while pending:
+            future = pending.popleft()
+            try:
+                data = future.result()
+            except Exception:
+                entry['state'] = "interrupted" # Detiene los segmentos pendientes
+                raise
+            if entry['state'] == "interrupted":
+                break
+            f.write(data)
+            with entry['lock']:
+                entry['bytesReceived'] += len(data)
+                entry['segmentsDone'] += 1
+            submit_next()
+
+def start_segments_download(options, kind, resolve_fn, extension):
+    """Registra una descarga de segmentos en el planificador de downloads."""
+    if not options.get('url'):
+        raise Exception("URL no especificada")
+
+    filename = options.get('filename') or downloads.default_filename(options['url'], extension)
+    file_path = os.path.join(options.get('directory') or downloads.download_folder, filename)
+    # Mismas opciones de conexión que las descargas HTTP (rejectUnauthorized, proxy)
+    req_options = downloads.transfer_options(options)
+    concurrency = max(1, int(options.get('concurrency') or SEGMENT_CONCURRENCY))
+
+    def transfer(entry):
+        segments_transfer(entry, lambda: resolve_fn(options['url'], req_options, options), req_options, concurrency)
+
+    return downloads.add_download(options, file_path, transfer,
+                                  kind=kind, keys={}, segmentsTotal=0, segmentsDone=0)
+
+# --- MÉTODOS RPC ---
+
+def rpc_download_hls(options):
+    """
+    Descarga un stream HLS (m3u8) a un único archivo .ts/.mp4.
+
+    Opciones (además de url, directory, filename, headers, proxy, rejectUnauthorized,
+    priority, rateLimit):
+        maxBandwidth (int): ancho de banda máximo de la variante elegida.
+        concurrency (int): segmentos descargados en paralelo.
+    """
+    return start_segments_download(options, "hls", resolve_hls, "ts")
+
+def rpc_download_dash(options):
+    """
+    Descarga una representación de un stream DASH (mpd) a un único archivo.
+    El audio y el vídeo van en representaciones separadas; la mezcla corresponde al conversor.
+
+    Opciones (además de url, directory, filename, headers, proxy, rejectUnauthorized,
+    priority, rateLimit):
+        representation (str): ID de la representación a descargar.
+        contentType (str): "video" (por defecto) o "audio" si no se indica representación.
+        maxBandwidth (int): ancho de banda máximo de la representación elegida.
+        concurrency (int): segmentos descargados en paralelo.
+    """
+    return start_segments_download(options, "dash", resolve_dash, "mp4")
+
+# Registrar los métodos RPC
+rpc.listen({
+    "downloads.downloadHls": rpc_download_hls,
+    "downloads.downloadDash": rpc_download_dash
+})
@@ -0,0 +1,71 @@
+# vdhcoapp_py/throttle.py
+
+# Limitación de ancho de banda con "token bucket".
+# Cada cubo se rellena a 'rate' bytes/segundo hasta 'capacity' bytes (ráfaga).
+# Consumir más de lo disponible deja el cubo en negativo y el hilo duerme lo
+# necesario para saldar la deuda, de modo que la media se ajusta al límite.
+
+import re
+import threading
+import time
+
+BURST_SECONDS = 1.0 # Tamaño de ráfaga expresado en segundos de tasa
+
+RATE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+RATE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+class TokenBucket:
+    """Cubo de tokens seguro entre hilos. rate=None o 0 significa sin límite."""
+
+    def __init__(self, rate=None):
+        self.lock = threading.Lock()
+        self.rate = None
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Cambia la tasa en caliente; los hilos que esperan la aplican en el siguiente bloque."""
+        with self.lock:
+            self.rate = float(rate) if rate else None
+            self.capacity = (self.rate or 0.0) * BURST_SECONDS
+            self.tokens = min(self.tokens, self.capacity)
+            self.updated = time.monotonic()
+
+    def consume(self, amount):
+        """Descuenta 'amount' bytes y bloquea el hilo si se supera la tasa."""
+        with self.lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+# Límite global compartido por todas las descargas
+global_bucket = TokenBucket()
+
+def throttle(bucket, amount):
+    """Aplica el límite propio de la descarga y después el global."""
+    if bucket:
+        bucket.consume(amount)
+    global_bucket.consume(amount)
+
+def parse_rate(value):
+    """
+    Convierte una tasa como '500K', '2M' o '1048576' a bytes/segundo.
+    Devuelve None para valores vacíos o '0' (sin límite).
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return value or None
+    m = RATE_PATTERN.match(str(value))
+    if not m:
+        raise ValueError(f"Tasa no válida: {value}")
+    rate = float(m.group(1)) * RATE_UNITS[m.group(2).lower()]
+    return rate or None
@@ -0,0 +1,203 @@
+# vdhcoapp_py/transport.py
+
+# Capa de transporte HTTP compartida por downloads.py, request_ops.py y http_request.py.
+# Mantiene un pool de requests.Session por (esquema, host, proxy, verify) para reutilizar
+# conexiones TCP/TLS (keep-alive) entre llamadas al mismo origen, en lugar de abrir
+# una conexión nueva con cada requests.get/requests.request.
+# Las sesiones no guardan cookies: cada petición lleva solo las de la extensión.
+
+import threading
+import time
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import rpc
+from . import logger
+
+# --- CONFIGURACIÓN ---
+POOL_SIZE = 16 # Conexiones keep-alive por sesión (por origen)
+KEEP_ALIVE = True # Si es False, se envía 'Connection: close' en cada petición
+IDLE_TIMEOUT = 60.0 # Segundos sin uso tras los que se cierra una sesión
+EVICT_INTERVAL = 10.0 # Segundos mínimos entre barridos de sesiones inactivas
+
+# {(scheme, host, proxy, verify): {'session': requests.Session, 'last_used': float,
+#  'active': peticiones en curso, 'retired': fuera del pool, se cierra al quedar libre}}
+sessions = {}
+sessions_lock = threading.Lock()
+last_eviction = 0.0
+
+# --- CONFIGURACIÓN EN TIEMPO DE EJECUCIÓN ---
+
+def configure(pool_size=None, keep_alive=None, idle_timeout=None):
+    """
+    Ajusta los parámetros del pool. Las sesiones existentes se cierran para
+    que los nuevos valores se apliquen a las siguientes peticiones.
+    """
+    global POOL_SIZE, KEEP_ALIVE, IDLE_TIMEOUT
+    if pool_size is not None:
+        POOL_SIZE = int(pool_size)
+    if keep_alive is not None:
+        KEEP_ALIVE = bool(keep_alive)
+    if idle_timeout is not None:
+        IDLE_TIMEOUT = float(idle_timeout)
+    close_all()
+
+# --- GESTIÓN DEL POOL ---
+
+def session_key(url, proxies=None, verify=True):
+    """Clave del pool: (esquema, host:puerto, proxy, verify)."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    proxy = (proxies or {}).get(scheme)
+    return (scheme, parts.netloc.lower(), proxy, verify)
+
+def new_session(proxies, verify):
+    """Crea una sesión con adaptadores HTTP dimensionados según POOL_SIZE."""
+    session = requests.Session()
+    # La sesión se comparte entre peticiones no relacionadas al mismo origen: un
+    # Set-Cookie de una no debe reenviarse en las siguientes. Las cookies de una
+    # cadena de redirecciones siguen funcionando (requests las guarda por petición).
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if proxies:
+        session.proxies.update(proxies)
+    session.verify = verify
+    if not KEEP_ALIVE:
+        session.headers['Connection'] = "close"
+    return session
+
+def evict_idle(now=None):
+    """Cierra las sesiones sin peticiones en curso que llevan más de IDLE_TIMEOUT segundos sin usarse."""
+    global last_eviction
+    now = now or time.monotonic()
+    with sessions_lock:
+        last_eviction = now
+        idle = [key for key, slot in sessions.items()
+                if not slot['active'] and now - slot['last_used'] > IDLE_TIMEOUT]
+        evicted = [sessions.pop(key)['session'] for key in idle]
+    for session in evicted:
+        session.close()
+    if evicted:
+        logger.info(f"Transporte: {len(evicted)} sesiones inactivas cerradas.")
+
+def acquire_session(url, proxies=None, verify=True):
+    """
+    Obtiene (o crea) la sesión compartida para el origen de 'url' y la marca en uso.
+    Devuelve su entrada del pool; hay que liberarla con release_session().
+    """
+    now = time.monotonic()
+    if now - last_eviction >= EVICT_INTERVAL:
+        evict_idle(now)
+
+    key = session_key(url, proxies, verify)
+    with sessions_lock:
+        slot = sessions.get(key)
+        if not slot:
+            slot = sessions[key] = {'session': new_session(proxies, verify), 'last_used': now,
+                                    'active': 0, 'retired': False}
+        slot['last_used'] = now
+        slot['active'] += 1
+        return slot
+
+def release_session(slot):
+    """Marca el fin de una petición; cierra la sesión si se retiró del pool mientras se usaba."""
+    with sessions_lock:
+        slot['active'] -= 1
+        slot['last_used'] = time.monotonic()
+        close = slot['retired'] and not slot['active']
+    if close:
+        slot['session'].close()
+
+def get_session(url, proxies=None, verify=True):
+    """Obtiene (o crea) la sesión compartida para el origen de 'url'."""
+    slot = acquire_session(url, proxies, verify)
+    release_session(slot)
+    return slot['session']
+
+def close_all():
+    """
+    Vacía el pool. Las sesiones libres se cierran ya; las que tienen peticiones en
+    curso (p. ej. una descarga en streaming), cuando termine la última.
+    """
+    with sessions_lock:
+        closing = []
+        for slot in sessions.values():
+            slot['retired'] = True
+            if not slot['active']:
+                closing.append(slot['session'])
+        sessions.clear()
+    for session in closing:
+        session.close()
+
+# --- API DE PETICIONES ---
+
+def request(method, url, proxies=None, verify=True, **kwargs):
+    """
+    Equivalente a requests.request, pero sobre una sesión del pool.
+    Con stream=True la sesión sigue en uso hasta que se cierra la respuesta.
+    """
+    slot = acquire_session(url, proxies, verify)
+    try:
+        response = slot['session'].request(method, url, **kwargs)
+    except BaseException:
+        release_session(slot)
+        raise
+    if not kwargs.get('stream'):
+        release_session(slot) # El cuerpo ya está leído
+        return response
+
+    released = threading.Lock()
+    def release_once():
+        if released.acquire(blocking=False):
+            release_session(slot)
+
+    original_close = response.close
+    def close():
+        try:
+            original_close()
+        finally:
+            release_once()
+    response.close = close
+    # Por si la respuesta se descarta sin cerrarla
+    weakref.finalize(response, release_once)
+    return response
+
+def get(url, **kwargs):
+    """Equivalente a requests.get, pero sobre una sesión del pool."""
+    return request("GET", url, **kwargs)
+
+def stats():
+    """Lista las sesiones abiertas por origen y su tiempo inactivo (para diagnóstico)."""
+    now = time.monotonic()
+    with sessions_lock:
+        return [{
+            "scheme": key[0],
+            "host": key[1],
+            "proxy": key[2],
+            "verify": key[3],
+            "active": slot['active'],
+            "idle": round(now - slot['last_used'], 3)
+        } for key, slot in sessions.items()]
+
+# --- MÉTODOS RPC ---
+
+def rpc_configure(options):
+    """Ajusta el pool desde la extensión: {poolSize, keepAlive, idleTimeout}."""
+    configure(
+        pool_size=options.get('poolSize'),
+        keep_alive=options.get('keepAlive'),
+        idle_timeout=options.get('idleTimeout')
+    )
+    return {"poolSize": POOL_SIZE, "keepAlive": KEEP_ALIVE, "idleTimeout": IDLE_TIMEOUT}
+
+# Registrar los métodos RPC
+rpc.listen({
+    "transport.configure": rpc_configure,
+    "transport.stats": stats
+})
@@ -0,0 +1,144 @@
+# vdhcoapp_py/workers.py
+
+# Pool de hilos con cola acotada para despachar las peticiones RPC.
+# A diferencia de concurrent.futures.ThreadPoolExecutor (cola ilimitada), aquí la
+# cola tiene un tamaño máximo: si se llena, submit() espera hasta 'put_timeout'
+# segundos y después rechaza la tarea con PoolSaturated, de modo que una ráfaga
+# de peticiones no acumula trabajo (ni hilos) sin límite.
+
+import queue
+import threading
+from concurrent.futures import Executor, Future
+
+class PoolSaturated(Exception):
+    """La cola del pool está llena y la tarea no se ha aceptado."""
+
+class BoundedExecutor(Executor):
+    """Executor con un máximo de hilos (creados bajo demanda) y cola acotada."""
+
+    def __init__(self, name, max_workers, queue_size, put_timeout=0.0):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.lock = threading.Lock()
+        self.threads = []
+        self.idle = 0
+        # Hilos libres para tomar una tarea nueva: cada hilo lo libera al terminar una
+        # tarea y submit() lo consume (como ThreadPoolExecutor). 'idle' no sirve para
+        # decidir porque cuenta también a los hilos a punto de tomar una tarea anterior.
+        self.free_workers = threading.Semaphore(0)
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_queue = 0
+        self.closed = False
+        self.pending_stops = 0 # Señales de cierre que aún no cabían en la cola
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Encola fn(*args, **kwargs) y devuelve su Future; lanza PoolSaturated si no cabe."""
+        if self.closed:
+            raise RuntimeError(f"Pool '{self.name}' cerrado")
+
+        future = Future()
+        try:
+            if self.put_timeout:
+                self.queue.put((future, fn, args, kwargs), timeout=self.put_timeout)
+            else:
+                self.queue.put_nowait((future, fn, args, kwargs))
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            raise PoolSaturated(f"Pool '{self.name}' saturado ({self.queue.maxsize} tareas en cola)")
+
+        with self.lock:
+            self.submitted += 1
+            self.peak_queue = max(self.peak_queue, self.queue.qsize())
+        # Crear un hilo nuevo solo si no hay ninguno libre
+        if self.free_workers.acquire(blocking=False):
+            return future
+        with self.lock:
+            if len(self.threads) < self.max_workers:
+                t = threading.Thread(target=self.worker, name=f"rpc-{self.name}-{len(self.threads) + 1}", daemon=True)
+                self.threads.append(t)
+                t.start()
+        return future
+
+    def worker(self):
+        """Bucle de un hilo del pool: ejecuta tareas hasta recibir la señal de cierre (None)."""
+        while True:
+            with self.lock:
+                self.idle += 1
+            item = self.queue.get()
+            with self.lock:
+                self.idle -= 1
+            if item is None:
+                return
+            if self.closed:
+                self.place_stops() # Acaba de quedar un hueco en la cola
+
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                self.free_workers.release()
+                continue
+            with self.lock:
+                self.active += 1
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self.completed += 1
+                self.free_workers.release()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """Detiene los hilos del pool (tras vaciar la cola, salvo cancel_futures)."""
+        self.closed = True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item:
+                    item[0].cancel()
+        with self.lock:
+            self.pending_stops = len(self.threads)
+        # Sin bloquear: con la cola llena, las señales restantes las encolan los
+        # hilos a medida que toman tareas y liberan huecos
+        self.place_stops()
+        if wait:
+            for t in list(self.threads):
+                t.join()
+
+    def place_stops(self):
+        """Encola las señales de cierre (None) pendientes que quepan, sin bloquear."""
+        with self.lock:
+            while self.pending_stops:
+                try:
+                    self.queue.put_nowait(None)
+                except queue.Full:
+                    return
+                self.pending_stops -= 1
+
+    def stats(self):
+        """Métricas del pool para dimensionarlo."""
+        with self.lock:
+            return {
+                "name": self.name,
+                "maxWorkers": self.max_workers,
+                "threads": len(self.threads),
+                "active": self.active,
+                "idle": self.idle,
+                "queued": self.queue.qsize(),
+                "queueSize": self.queue.maxsize,
+                "peakQueued": self.peak_queue,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }